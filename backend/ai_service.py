@@ -1,25 +1,215 @@
 # backend/ai_service.py
 
 import os
+import re
+import copy
 import json
+import asyncio
+import hashlib
+import random
 from dotenv import load_dotenv
-from typing import List, Dict, Union
+from typing import List, Dict, Union, AsyncIterator, Tuple
 import openai
 
+from cache import TTLCache, SQLiteCacheStore, TieredCache
+
 load_dotenv()
 
-# Initialize the OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+# Initialize the OpenAI client. OPENAI_BASE_URL can point it at fake_llm.py for offline testing.
+# Retries are handled below (with jitter) rather than by the client.
+client = openai.AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=os.getenv("OPENAI_BASE_URL") or None,
+    timeout=OPENAI_TIMEOUT_SECONDS,
+    max_retries=0,
+)
+
+# --- AI result cache ---
+# Keyed by a hash of the normalized prompt inputs. AI_CACHE_DB enables the persistent tier.
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+AI_CACHE_DB = os.getenv("AI_CACHE_DB")
+
+ai_cache = TieredCache(
+    memory=TTLCache(maxsize=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL_SECONDS),
+    persistent=SQLiteCacheStore(AI_CACHE_DB, ttl=AI_CACHE_TTL_SECONDS) if AI_CACHE_DB else None,
+)
+
+def _normalize_text(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().casefold()
+
+def _cache_key(kind: str, inputs) -> str:
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f"{kind}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
 
-def generate_recipes_from_specials(specials_list: List, preferences: object, pantry_items: List) -> List[Dict]:
+def _normalize_recipe(recipe: Dict) -> Dict:
+    return {
+        "title": _normalize_text(recipe.get("title")),
+        "description": _normalize_text(recipe.get("description")),
+        "instructions": _normalize_text(recipe.get("instructions")),
+        "ingredients": sorted(
+            (_normalize_text(ing.get("name")), _normalize_text(ing.get("quantity")))
+            for ing in recipe.get("ingredients", [])
+        ),
+        "tags": sorted(_normalize_text(tag) for tag in recipe.get("tags", [])),
+    }
+
+# Caps how many LLM calls this process has in flight at once
+_llm_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+async def _create_chat_completion(**kwargs):
     """
-    Generates recipes from a list of specials using the OpenAI API.
+    Calls the chat completions API under the concurrency semaphore, retrying transient
+    failures with exponential backoff and full jitter.
+    """
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            async with _llm_semaphore:
+                return await client.chat.completions.create(model=OPENAI_MODEL, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == OPENAI_MAX_RETRIES:
+                raise
+            delay = random.uniform(0, OPENAI_RETRY_BASE_DELAY * (2 ** attempt))
+            print(f"OpenAI call failed ({type(e).__name__}), retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+
+async def _stream_chat_completion(**kwargs) -> AsyncIterator[str]:
     """
+    Streams the text deltas of a chat completion. The semaphore is held for the whole stream;
+    only opening the stream is retried, since a half-consumed stream can't be replayed.
+    """
+    async with _llm_semaphore:
+        for attempt in range(OPENAI_MAX_RETRIES + 1):
+            try:
+                stream = await client.chat.completions.create(model=OPENAI_MODEL, stream=True, **kwargs)
+                break
+            except RETRYABLE_ERRORS as e:
+                if attempt == OPENAI_MAX_RETRIES:
+                    raise
+                delay = random.uniform(0, OPENAI_RETRY_BASE_DELAY * (2 ** attempt))
+                print(f"OpenAI stream failed to open ({type(e).__name__}), retrying in {delay:.2f}s...")
+                await asyncio.sleep(delay)
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class IncrementalJSONArrayParser:
+    """
+    Pulls complete objects out of a JSON array while it is still being streamed.
+
+    The first array in the text is treated as the recipe list, so both a bare array and
+    an array wrapped in an object ({"recipes": [...]}) work. Each object directly inside
+    it is returned from feed() as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._pos = 0
+        self._depth = 0
+        self._array_depth = None # depth just inside the recipe array, once it's been found
+        self._object_start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[Dict]:
+        self._buffer.append(text)
+        data = "".join(self._buffer)
+        self._buffer = [data]
+        completed = []
+
+        for i in range(self._pos, len(data)):
+            char = data[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if char == "[" and self._array_depth is None:
+                    self._array_depth = self._depth + 1
+                elif char == "{" and self._depth == self._array_depth:
+                    self._object_start = i
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if char == "}" and self._depth == self._array_depth and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(data[self._object_start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed recipe object in AI stream: {e}")
+                    self._object_start = None
+
+        self._pos = len(data)
+        # Nothing before the current object is needed again
+        if self._object_start is None:
+            self._buffer, self._pos = [], 0
+        elif self._object_start > 0:
+            self._buffer = [data[self._object_start:]]
+            self._pos -= self._object_start
+            self._object_start = 0
+        return completed
+
+
+def _item_name(item) -> str:
+    return item["name"] if isinstance(item, dict) else item.name
+
+def _extract_recipe_list(data) -> List[Dict]:
+    # More robust parsing logic
+    # Case 1: The AI returned the array directly.
+    if isinstance(data, list):
+        return data
+
+    # Case 2: The AI wrapped the array in an object (e.g., {"recipes": [...]}).
+    # Find the first value in the JSON object that is a list.
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+    return []
+
+def generation_cache_key(specials_list: List, preferences: object, pantry_items: List, kind: str = "generate") -> str:
+    """Cache key of a recipe generation request's normalized inputs, under the given kind of entry."""
+    return _cache_key(kind, {
+        "specials": sorted(
+            (_normalize_text(item.ingredient_name), _normalize_text(item.store), _normalize_text(item.price))
+            for item in specials_list
+        ),
+        "household_size": getattr(preferences, 'household_size', None),
+        "dietary_restrictions": _normalize_text(preferences.dietary_restrictions),
+        "pantry": sorted({_normalize_text(_item_name(item)) for item in pantry_items or []}),
+    })
+
+def _build_generation_prompt(specials_list: List, preferences: object, pantry_items: List) -> Tuple[str, str]:
+    """Returns the cache key and the prompt for a recipe generation request."""
+    household_size = getattr(preferences, 'household_size', None)
+    cache_key = generation_cache_key(specials_list, preferences, pantry_items)
+
     specials_str = ", ".join([f"{item.ingredient_name} at {item.store} for {item.price}" for item in specials_list])
-    pantry_str = ", ".join([item.name for item in pantry_items]) if pantry_items else "empty"
+    pantry_str = ", ".join([_item_name(item) for item in pantry_items]) if pantry_items else "empty"
     preferences_str = (
-        f"Household Size: {preferences.household_size}, "
-        f"Dietary Restrictions: {', '.join(preferences.dietary_restrictions) or 'none'}"
+        f"Household Size: {household_size or 'not specified'}, "
+        f"Dietary Restrictions: {preferences.dietary_restrictions or 'none'}"
     )
 
     prompt = f"""
@@ -40,29 +230,33 @@ def generate_recipes_from_specials(specials_list: List, preferences: object, pan
     - The "ingredients" key must be an array of objects, where each object has "name" and "quantity" keys (e.g., {{"name": "Chicken Breast", "quantity": "500g"}}).
     - The "tags" key should be an array of 3-5 strings that describe the recipe (e.g., "Quick & Easy", "Vegan", "High-Protein").
     """
-    
+    return cache_key, prompt
+
+async def generate_recipes_from_specials(specials_list: List, preferences: object, pantry_items: List, use_cache: bool = True) -> List[Dict]:
+    """
+    Generates recipes from a list of specials using the OpenAI API.
+    Identical inputs are answered from the cache unless use_cache is False.
+    """
+    cache_key, prompt = _build_generation_prompt(specials_list, preferences, pantry_items)
+    if use_cache:
+        cached = ai_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await _create_chat_completion(
             messages=[{"role": "user", "content": prompt}],
             # Using response_format is good, but we still need robust parsing
         )
         response_content = response.choices[0].message.content
         data = json.loads(response_content)
         
-        # More robust parsing logic
-        # Case 1: The AI returned the array directly.
-        if isinstance(data, list):
-            return data
-        
-        # Case 2: The AI wrapped the array in an object (e.g., {"recipes": [...]}).
-        # Find the first value in the JSON object that is a list.
-        if isinstance(data, dict):
-            for value in data.values():
-                if isinstance(value, list):
-                    return value
-        
-        # If neither of the above, something is wrong with the format.
+        recipes = _extract_recipe_list(data)
+        if recipes:
+            ai_cache.set(cache_key, recipes)
+            return copy.deepcopy(recipes)
+
+        # Otherwise something is wrong with the format.
         print("AI response was valid JSON but did not contain a recipe list.")
         return []
 
@@ -70,11 +264,46 @@ def generate_recipes_from_specials(specials_list: List, preferences: object, pan
         print(f"An unexpected error occurred during recipe generation: {e}")
         return []
 
-def modify_recipe_with_ai(original_recipe: Dict, modification_prompt: str) -> Dict:
+async def stream_recipes_from_specials(specials_list: List, preferences: object, pantry_items: List, use_cache: bool = True) -> AsyncIterator[Dict]:
+    """
+    Streaming variant of generate_recipes_from_specials: yields each recipe dict as soon as
+    the model has finished writing it. The full list is cached once the stream completes.
+    """
+    cache_key, prompt = _build_generation_prompt(specials_list, preferences, pantry_items)
+    if use_cache:
+        cached = ai_cache.get(cache_key)
+        if cached is not None:
+            for recipe in copy.deepcopy(cached):
+                yield recipe
+            return
+
+    parser = IncrementalJSONArrayParser()
+    recipes = []
+    async for delta in _stream_chat_completion(messages=[{"role": "user", "content": prompt}]):
+        for recipe in parser.feed(delta):
+            recipes.append(recipe)
+            yield copy.deepcopy(recipe)
+
+    if recipes:
+        ai_cache.set(cache_key, recipes)
+    else:
+        print("AI stream finished without producing a recipe object.")
+
+async def modify_recipe_with_ai(original_recipe: Dict, modification_prompt: str, use_cache: bool = True) -> Dict:
     """
     Takes an existing recipe and a user's modification instruction,
     and returns a new, modified recipe dictionary using the OpenAI API.
+    Identical recipe + prompt pairs are answered from the cache unless use_cache is False.
     """
+    cache_key = _cache_key("modify", {
+        "recipe": _normalize_recipe(original_recipe),
+        "prompt": _normalize_text(modification_prompt),
+    })
+    if use_cache:
+        cached = ai_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
     ingredients_str = "\n".join([f"- {ing['quantity']} {ing['name']}" for ing in original_recipe['ingredients']])
     original_recipe_str = (
         f"Title: {original_recipe['title']}\n"
@@ -105,14 +334,14 @@ def modify_recipe_with_ai(original_recipe: Dict, modification_prompt: str) -> Di
     """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await _create_chat_completion(
             messages=[{"role": "user", "content": prompt}],
             response_format={"type": "json_object"}
         )
         response_content = response.choices[0].message.content
         modified_recipe_data = json.loads(response_content)
-        return modified_recipe_data
+        ai_cache.set(cache_key, modified_recipe_data)
+        return copy.deepcopy(modified_recipe_data)
     except Exception as e:
         print(f"An error occurred during AI recipe modification: {e}")
         return {"error": "Could not modify the recipe. Please try again."}
\ No newline at end of file
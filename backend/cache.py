@@ -0,0 +1,219 @@
+# backend/cache.py
+
+"""
+Small in-process caches shared by the services.
+
+TTLCache is a thread-safe LRU with per-entry expiry and hit/miss counters.
+SQLiteCacheStore is an optional persistent tier (its own SQLite file) that survives restarts
+and is shared by every worker on the machine. TieredCache puts the two together.
+RefreshingIndex is the base of the in-memory indexes built from the database (ingredient
+search, recipe matching, the price book).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from sqlmodel import Session
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = _MISSING) -> None:
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SQLiteCacheStore:
+    """JSON values in a key/value table, with expiry checked on read."""
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM cache_entry WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+    """Checks the in-process tier first, then the persistent tier (promoting hits into memory)."""
+
+    def __init__(self, memory: TTLCache, persistent: Optional[SQLiteCacheStore] = None):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.persistent is not None:
+            value = self.persistent.get(key, _MISSING)
+            if value is not _MISSING:
+                self.memory.set(key, value)
+                return value
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.persistent is not None:
+            self.persistent.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.stats(),
+            "persistent": self.persistent.stats() if self.persistent is not None else None,
+        }
+
+
+class RefreshingIndex:
+    """
+    An in-memory index built from the database. The first use builds it inline; after that it
+    is rebuilt in a background thread once it is max_age seconds old or has been invalidated,
+    and the current one keeps serving meanwhile.
+
+    Subclasses implement _build(session), which reads the database and then, holding _lock,
+    swaps the result in and sets _built_at = time.monotonic().
+    """
+
+    description = "index" # for error messages
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._refreshing = False
+
+    def invalidate(self) -> None:
+        """Rebuild on next use, serving the current index meanwhile."""
+        if self._built_at is not None:
+            self._built_at = float("-inf")
+
+    def _is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age
+
+    def build(self, session: Session) -> None:
+        with self._build_lock:
+            self._build(session)
+
+    def _build(self, session: Session) -> None:
+        raise NotImplementedError
+
+    def _refresh_in_background(self, bind) -> None:
+        def refresh():
+            try:
+                with Session(bind) as session:
+                    self.build(session)
+            except Exception as e:
+                print(f"Could not rebuild the {self.description}: {e}")
+            finally:
+                self._refreshing = False
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _ensure_fresh(self, session: Session) -> None:
+        if self._built_at is None:
+            # Nothing to serve yet, so the first build happens inline
+            with self._build_lock:
+                if self._built_at is None:
+                    self._build(session)
+        elif self._is_stale():
+            self._refresh_in_background(session.get_bind())
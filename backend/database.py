@@ -1,16 +1,144 @@
 # backend/database.py
 
+import os
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from migrations import run_migrations
+
+load_dotenv()
 
 sqlite_file_name = "db.sqlite3"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
 
-engine = create_engine(sqlite_url, echo=True)
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def _apply_sqlite_pragmas(engine: Engine, in_memory: bool) -> None:
+    """Tunes every new SQLite connection so readers don't block behind the writer."""
+    mmap_size = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+    cache_size = _env_int("SQLITE_CACHE_SIZE", -64000) # negative = KiB, so ~64MB
+    busy_timeout = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA cache_size={cache_size}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.close()
+
+def _sqlite_pool_settings() -> dict:
+    return dict(
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+        pool_pre_ping=_env_bool("DB_POOL_PRE_PING", False),
+    )
+
+def _server_pool_settings() -> dict:
+    return dict(
+        pool_size=_env_int("DB_POOL_SIZE", 10),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 20),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+        pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=_env_bool("DB_POOL_PRE_PING", True),
+    )
+
+def build_engine(database_url: str = None) -> Engine:
+    """
+    Creates the app's engine from environment settings.
+
+    DATABASE_URL   defaults to the local db.sqlite3 file; a postgresql:// URL is also accepted
+    DB_ECHO        log every SQL statement (off by default)
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+                   connection pool settings
+    SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, SQLITE_BUSY_TIMEOUT_MS
+                   per-connection SQLite pragmas (WAL and synchronous=NORMAL are always on)
+    """
+    url = make_url(database_url or os.getenv("DATABASE_URL") or sqlite_url)
+    echo = _env_bool("DB_ECHO", False)
+
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        engine_kwargs = {"connect_args": {"check_same_thread": False}}
+        if not in_memory:
+            engine_kwargs.update(_sqlite_pool_settings())
+        engine = create_engine(url, echo=echo, **engine_kwargs)
+        _apply_sqlite_pragmas(engine, in_memory)
+        return engine
+
+    # Server databases (e.g. Postgres behind several uvicorn workers): each worker gets its
+    # own pool, so keep it modest, recycle idle connections and check them before use.
+    return create_engine(url, echo=echo, **_server_pool_settings())
+
+# Async drivers used for the same database when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def _async_url(url: URL) -> URL:
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+def build_async_engine(database_url: str = None) -> AsyncEngine:
+    """
+    Async counterpart of build_engine for the same database (aiosqlite locally, asyncpg for Postgres).
+    ASYNC_DATABASE_URL overrides the derived URL; the pool and pragma settings are shared.
+    """
+    async_url = database_url or os.getenv("ASYNC_DATABASE_URL")
+    url = make_url(async_url) if async_url else _async_url(make_url(os.getenv("DATABASE_URL") or sqlite_url))
+    echo = _env_bool("DB_ECHO", False)
+
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        # An in-memory database lives in its one connection, so it keeps the default static pool
+        async_engine = create_async_engine(url, echo=echo, **({} if in_memory else _sqlite_pool_settings()))
+        _apply_sqlite_pragmas(async_engine.sync_engine, in_memory)
+        return async_engine
+
+    return create_async_engine(url, echo=echo, **_server_pool_settings())
+
+engine = build_engine()
+async_engine = build_async_engine()
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+
+def dialect_insert(session, table):
+    """
+    INSERT construct for the session's database that supports on_conflict_do_nothing/do_update
+    (both SQLite and Postgres implement ON CONFLICT).
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on '{dialect}' databases")
 
 # --- NEW: get_session function now lives here ---
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_async_session():
+    # expire_on_commit=False: attributes can't be lazily reloaded on an async session
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,82 @@
+# backend/fake_llm.py
+
+"""
+A stand-in for the OpenAI chat completions API, for testing AI latency and throughput offline.
+
+    uvicorn fake_llm:app --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 uvicorn main:app
+
+FAKE_LLM_LATENCY_MS sets how long each completion takes (default 1500ms). With "stream": true
+the same total latency is spread evenly over the streamed chunks.
+"""
+
+import os
+import json
+import time
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+FAKE_LLM_LATENCY_MS = int(os.getenv("FAKE_LLM_LATENCY_MS", "1500"))
+STREAM_CHUNK_CHARS = 16
+
+app = FastAPI()
+
+def _fake_recipe(n: int) -> dict:
+    return {
+        "title": f"Budget Chicken Traybake #{n}",
+        "description": "A one-pan dinner built around this week's specials.",
+        "instructions": "1. Preheat the oven to 200C.\n2. Toss everything with oil and salt.\n3. Roast for 35 minutes.",
+        "ingredients": [
+            {"name": "Chicken Breast", "quantity": "500g"},
+            {"name": "Potato", "quantity": "4 medium"},
+            {"name": "Olive Oil", "quantity": "2 tbsp"},
+        ],
+        "tags": ["Quick & Easy", "High-Protein", "One-Pan"],
+    }
+
+def _completion_body(content: str, model: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+async def _stream_completion(content: str, model: str):
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+    delay = FAKE_LLM_LATENCY_MS / 1000 / max(len(pieces), 1)
+    for piece in pieces:
+        await asyncio.sleep(delay)
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+
+    # Modification requests ask for a single JSON object, generation for an array of 3
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        content = json.dumps(_fake_recipe(1))
+    else:
+        content = json.dumps([_fake_recipe(n) for n in range(1, 4)])
+
+    if body.get("stream"):
+        return StreamingResponse(_stream_completion(content, model), media_type="text/event-stream")
+
+    await asyncio.sleep(FAKE_LLM_LATENCY_MS / 1000)
+    return _completion_body(content, model)
@@ -0,0 +1,188 @@
+# backend/ingredient_search.py
+
+"""
+In-memory trigram index behind /api/ingredients/search (pantry autocomplete).
+
+A leading-wildcard LIKE can't use an index, so staple ingredients are kept in an inverted
+index from trigram -> ingredients. Matches are ranked by match quality (exact, prefix,
+word prefix, substring, then fuzzy trigram similarity for typos, taken against the closest
+run of words in the name) and then by popularity, i.e. how many recipes and pantries already
+use the ingredient.
+
+The index is built on first use. ORM writes to Ingredient mark it stale, and so does
+INGREDIENT_SEARCH_MAX_AGE passing (so changes made by other processes, like the seeder or
+other workers, show up); a stale index keeps serving while it is rebuilt in the background.
+"""
+
+import heapq
+import math
+import os
+import time
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlmodel import Session, select, func
+
+from cache import RefreshingIndex
+from models import Ingredient, RecipeIngredientLink, UserPantryLink, normalize_ingredient_name
+
+INGREDIENT_SEARCH_MAX_AGE = float(os.getenv("INGREDIENT_SEARCH_MAX_AGE", "300"))
+MIN_SIMILARITY = 0.3
+POPULARITY_WEIGHT = 0.1
+
+# Match-quality bands; popularity (and similarity, for typos) only order results within a band
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = 4, 3, 2, 1, 0
+
+
+class IndexedIngredient(NamedTuple):
+    id: int
+    name: str
+    key: str
+    category: Optional[str]
+    popularity: int
+    word_trigrams: Tuple[Tuple[str, ...], ...] # one tuple per word of the name
+
+
+def ngrams(text: str, n: int) -> Set[str]:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def word_trigrams(key: str) -> Set[str]:
+    """Trigrams of each word, padded so word starts and ends count (as in pg_trgm)."""
+    grams = set()
+    for word in key.split():
+        grams.update(ngrams(f"  {word} ", 3))
+    return grams
+
+def word_similarity(query_grams: Set[str], words: Tuple[Tuple[str, ...], ...], max_words: int) -> float:
+    """
+    Best trigram similarity between the query and any run of up to max_words consecutive words
+    of a name (the query's word count), so the other words of a long name don't drown out a
+    typo in one of them (like pg_trgm's word_similarity).
+    """
+    best = 0.0
+    for start, word in enumerate(words):
+        common = len(query_grams.intersection(word))
+        best = max(best, common / (len(query_grams) + len(word) - common))
+        # Runs of several words only matter for queries of several words
+        if max_words > 1:
+            span = set(word)
+            for next_word in words[start + 1:start + max_words]:
+                span.update(next_word)
+                common = len(query_grams.intersection(span))
+                best = max(best, common / (len(query_grams) + len(span) - common))
+    return best
+
+
+class IngredientSearchIndex(RefreshingIndex):
+    description = "ingredient search index"
+
+    def __init__(self, max_age: float = INGREDIENT_SEARCH_MAX_AGE):
+        super().__init__(max_age)
+        # Entries and postings are plain tuples of strings/ints, which the garbage collector
+        # stops tracking; otherwise every full collection would walk the whole index mid-request.
+        self._entries: List[tuple] = [] # fields as in IndexedIngredient
+        # Trigram -> positions of entries holding it, over both the whole key and its padded words
+        self._postings: Dict[str, Tuple[int, ...]] = {}
+
+    def _build(self, session: Session) -> None:
+        recipe_uses = (
+            select(RecipeIngredientLink.ingredient_id, func.count().label("uses"))
+            .group_by(RecipeIngredientLink.ingredient_id)
+            .subquery()
+        )
+        pantry_uses = (
+            select(UserPantryLink.ingredient_id, func.count().label("uses"))
+            .group_by(UserPantryLink.ingredient_id)
+            .subquery()
+        )
+        rows = session.exec(
+            select(
+                Ingredient.id, Ingredient.name, Ingredient.category,
+                func.coalesce(recipe_uses.c.uses, 0) + func.coalesce(pantry_uses.c.uses, 0)
+            )
+            .outerjoin(recipe_uses, recipe_uses.c.ingredient_id == Ingredient.id)
+            .outerjoin(pantry_uses, pantry_uses.c.ingredient_id == Ingredient.id)
+            .where(Ingredient.is_staple == True)
+        ).all()
+
+        entries: List[tuple] = []
+        postings: Dict[str, List[int]] = {}
+        for ingredient_id, name, category, popularity in rows:
+            key = normalize_ingredient_name(name)
+            words = tuple(tuple(word_trigrams(word)) for word in key.split())
+            position = len(entries)
+            entries.append((ingredient_id, name, key, category, popularity or 0, words))
+            for gram in word_trigrams(key).union(ngrams(key, 3)):
+                postings.setdefault(gram, []).append(position)
+
+        postings = {gram: tuple(positions) for gram, positions in postings.items()}
+        with self._lock:
+            self._entries, self._postings = entries, postings
+            self._built_at = time.monotonic()
+
+    def _substring_candidates(self, query_key: str) -> Set[int]:
+        # A match contains every trigram of the query. Two-letter queries only have the
+        # word-start gram " xy", so they match at the start of a word.
+        grams = ngrams(query_key, 3) if len(query_key) >= 3 else {f" {query_key}"}
+        postings = [self._postings.get(gram) for gram in grams]
+        if not postings or any(p is None for p in postings):
+            return set()
+        postings.sort(key=len)
+        return set(postings[0]).intersection(*postings[1:])
+
+    def _fuzzy_candidates(self, query_grams: Set[str]) -> List[int]:
+        # word_similarity <= shared / len(query_grams), so anything sharing fewer can't qualify
+        min_shared = max(1, math.ceil(MIN_SIMILARITY * len(query_grams)))
+        shared = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in query_grams))
+        return [position for position, count in shared.items() if count >= min_shared]
+
+    def search(self, session: Session, q: str, limit: int = 10) -> List[IndexedIngredient]:
+        self._ensure_fresh(session)
+
+        entries = self._entries
+        query_key = normalize_ingredient_name(q)
+        if len(query_key) < 2:
+            return []
+        query_grams = word_trigrams(query_key)
+        query_words = len(query_key.split())
+
+        scored = []
+        matched = set()
+        for position in self._substring_candidates(query_key):
+            _, _, key, _, popularity, _ = entries[position]
+            if query_key not in key and f" {query_key}" not in f" {key}":
+                continue
+            if key == query_key:
+                band = EXACT
+            elif key.startswith(query_key):
+                band = PREFIX
+            elif f" {query_key}" in key:
+                band = WORD_PREFIX
+            else:
+                band = SUBSTRING
+            matched.add(position)
+            scored.append((band, POPULARITY_WEIGHT * math.log1p(popularity), position))
+
+        # Only fall back to typo matching when the exact matches don't fill the page
+        if len(scored) < limit:
+            for position in self._fuzzy_candidates(query_grams):
+                if position in matched:
+                    continue
+                _, _, _, _, popularity, words = entries[position]
+                similarity = word_similarity(query_grams, words, query_words)
+                if similarity >= MIN_SIMILARITY:
+                    scored.append((FUZZY, similarity + POPULARITY_WEIGHT * math.log1p(popularity), position))
+
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], -item[1], entries[item[2]][1]))
+        return [IndexedIngredient(*entries[position]) for _, _, position in best]
+
+
+ingredient_search_index = IngredientSearchIndex()
+
+@event.listens_for(Ingredient, "after_insert")
+@event.listens_for(Ingredient, "after_update")
+@event.listens_for(Ingredient, "after_delete")
+def _invalidate_ingredient_search(mapper, connection, target):
+    ingredient_search_index.invalidate()
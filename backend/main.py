@@ -1,27 +1,54 @@
 # backend/main.py
 
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from contextlib import asynccontextmanager
-from typing import List, Optional, Dict
-from sqlmodel import Session, select, func
-from sqlalchemy.orm import selectinload
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from sqlmodel import Session, select, func, delete
+from sqlalchemy import insert, literal, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, load_only
 from datetime import date
 import os
+import json
+import base64
+import math
+import asyncio
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
 
-from database import engine, create_db_and_tables, get_session
-from models import User, Recipe, Ingredient, RecipeIngredientLink, PriceHistory, UserRecipeRatingLink, UserPantryLink
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from database import engine, create_db_and_tables, get_session, get_async_session, dialect_insert
+from models import (
+    User, Recipe, Ingredient, RecipeIngredientLink, RecipeTag, PriceHistory, UserRecipeLink, UserRecipeRatingLink,
+    UserPantryLink, PriceRollup, RecipeReadModel, normalize_ingredient_name, normalize_tag, chunked
+)
 from schemas import (
     GenerateRequest, UserCreate, UserRead, UserUpdate, Token,
-    RecipeResponse, IngredientInRecipe, RecipeCreate, PriceHistoryCreate,
-    PriceHistoryRead, RecipeRating, PantryItem, PantryItemCreate,
-    RecipeModificationRequest, GoogleLoginRequest
+    RecipeResponse, RecipeCreate, PriceHistoryCreate,
+    PriceHistoryRead, PriceBulkResponse, PriceBulkRowResult, RecipeRating, PantryItem, PantryItemCreate,
+    RecipeModificationRequest, GoogleLoginRequest, TagCount, PantryBulkUpdate, SavedRecipesUpdate, BulkUpdateResult,
+    RecipeMatchResponse, RecipeCostResponse, BasketPriceRequest, BasketPriceResponse, BasketItemPrice,
+    StoreBasketTotal, PriceSeries
+)
+from security import (
+    hash_password, verify_and_update_password, create_access_token, get_current_user, invalidate_user,
+    auth_cache_stats
+)
+from ingredient_search import ingredient_search_index
+from recipe_matching import recipe_match_index
+from pricing import parse_price, price_book
+from price_rollups import refresh_rollups, period_bounds, run_compaction, PRICE_HISTORY_RETENTION_DAYS
+from ratings import record_rating, rating_aggregator, RATING_WRITE_BEHIND
+from response_cache import response_cache, STATIC
+from recipe_read_model import refresh_recipe_read_models, json_array
+from ai_service import (
+    generate_recipes_from_specials, stream_recipes_from_specials, modify_recipe_with_ai, generation_cache_key, ai_cache
 )
-from security import get_password_hash, verify_password, create_access_token, get_current_user
-from ai_service import generate_recipes_from_specials, modify_recipe_with_ai
 
 origins = ["http://localhost:5173"]
 
@@ -29,8 +56,16 @@ origins = ["http://localhost:5173"]
 async def lifespan(app: FastAPI):
     print("Starting up... 🚀")
     create_db_and_tables()
+    background_tasks = []
+    if RATING_WRITE_BEHIND:
+        background_tasks.append(asyncio.create_task(rating_aggregator.run(engine)))
+    if PRICE_HISTORY_RETENTION_DAYS > 0:
+        background_tasks.append(asyncio.create_task(run_compaction(engine)))
     yield
     print("Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -39,61 +74,175 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 def get_or_create_ingredient(name: str, session: Session, category: Optional[str] = None) -> Ingredient:
-    exact_match = session.exec(select(Ingredient).where(func.lower(Ingredient.name) == name.lower())).first()
+    name_key = normalize_ingredient_name(name)
+    exact_match = session.exec(select(Ingredient).where(Ingredient.name_normalized == name_key)).first()
     if exact_match:
         if category and not exact_match.category:
             exact_match.category = category
             session.add(exact_match)
             session.commit()
             session.refresh(exact_match)
+            response_cache.bump("ingredients", "prices") # /api/prices/today shows the category
         return exact_match
 
     new_ingredient = Ingredient(name=name, category=category)
     session.add(new_ingredient)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # Another request created it first
+        session.rollback()
+        return session.exec(select(Ingredient).where(Ingredient.name_normalized == name_key)).one()
     session.refresh(new_ingredient)
     return new_ingredient
 
 
-def _save_recipe_to_db(recipe_data: RecipeCreate, session: Session) -> Recipe:
-    new_recipe = Recipe(
-        title=recipe_data.title,
-        description=recipe_data.description,
-        instructions=recipe_data.instructions,
-        tags=recipe_data.tags
+def resolve_ingredients(entries: Iterable[Tuple[str, Optional[str]]], session: Session) -> Dict[str, Ingredient]:
+    """
+    Set-based version of get_or_create_ingredient for many names at once.
+    Takes (name, category) pairs and returns a dict keyed by normalize_ingredient_name(name).
+    Existing ingredients are found with one IN query, missing ones are inserted with one
+    INSERT ... ON CONFLICT DO NOTHING and read back. Nothing is committed; the caller owns the transaction.
+    """
+    wanted: Dict[str, Tuple[str, Optional[str]]] = {}
+    for name, category in entries:
+        key = normalize_ingredient_name(name)
+        if key not in wanted or (category and not wanted[key][1]):
+            wanted[key] = (name, category)
+
+    def lookup(keys: List[str]) -> Dict[str, Ingredient]:
+        found: Dict[str, Ingredient] = {}
+        for chunk in chunked(keys):
+            for ingredient in session.exec(select(Ingredient).where(Ingredient.name_normalized.in_(chunk))).all():
+                found[ingredient.name_normalized] = ingredient
+        return found
+
+    resolved = lookup(list(wanted))
+
+    missing = [key for key in wanted if key not in resolved]
+    if missing:
+        session.execute(
+            dialect_insert(session, Ingredient).on_conflict_do_nothing(),
+            [
+                {"name": wanted[key][0], "name_normalized": key, "category": wanted[key][1], "is_staple": False}
+                for key in missing
+            ]
+        )
+        resolved.update(lookup(missing))
+
+    for key, (name, category) in wanted.items():
+        existing = resolved[key]
+        if category and not existing.category:
+            existing.category = category
+            session.add(existing)
+
+    session.flush()
+    return resolved
+
+
+def _recipe_tag_rows(recipe_id: int, tags: Iterable[str]) -> List[Dict[str, Any]]:
+    """RecipeTag rows for a recipe's tags, one per normalized tag."""
+    rows: Dict[str, Dict[str, Any]] = {}
+    for tag in tags:
+        key = normalize_tag(tag)
+        if key and key not in rows:
+            rows[key] = {"recipe_id": recipe_id, "tag_normalized": key, "tag": tag.strip()}
+    return list(rows.values())
+
+
+def _save_recipes_to_db(recipes: List[RecipeCreate], session: Session) -> List[Recipe]:
+    """
+    Saves a batch of recipes in a single transaction: one ingredient resolution pass for the
+    whole batch, one INSERT for the recipes and one executemany each for ingredient links and tags.
+    """
+    if not recipes:
+        return []
+
+    ingredients = resolve_ingredients(
+        ((ing.name, None) for recipe_data in recipes for ing in recipe_data.ingredients), session
     )
-    session.add(new_recipe)
 
-    for ing_data in recipe_data.ingredients:
-        ingredient = get_or_create_ingredient(ing_data.name, session)
-        link = RecipeIngredientLink(recipe=new_recipe, ingredient=ingredient, quantity=ing_data.quantity)
-        session.add(link)
-        
+    new_recipes = [
+        Recipe(
+            title=recipe_data.title,
+            description=recipe_data.description,
+            instructions=recipe_data.instructions,
+            tags=recipe_data.tags
+        )
+        for recipe_data in recipes
+    ]
+    session.add_all(new_recipes)
+    session.flush()
+
+    link_rows = []
+    tag_rows = []
+    recipe_ingredients = []
+    for new_recipe, recipe_data in zip(new_recipes, recipes):
+        tag_rows.extend(_recipe_tag_rows(new_recipe.id, recipe_data.tags))
+        # A recipe may list the same ingredient twice; the link table allows one row per pair
+        quantities: Dict[int, List[str]] = {}
+        for ing_data in recipe_data.ingredients:
+            ingredient = ingredients[normalize_ingredient_name(ing_data.name)]
+            quantities.setdefault(ingredient.id, []).append(ing_data.quantity)
+        link_rows.extend(
+            {"recipe_id": new_recipe.id, "ingredient_id": ingredient_id, "quantity": " + ".join(qty)}
+            for ingredient_id, qty in quantities.items()
+        )
+        recipe_ingredients.append((new_recipe.id, list(quantities)))
+    if link_rows:
+        session.execute(insert(RecipeIngredientLink), link_rows)
+    if tag_rows:
+        session.execute(insert(RecipeTag), tag_rows)
+    refresh_recipe_read_models(session, [new_recipe.id for new_recipe in new_recipes])
+
     session.commit()
-    session.refresh(new_recipe)
-    return new_recipe
+    recipe_match_index.add_recipes(recipe_ingredients)
+    response_cache.bump("recipes")
+    return new_recipes
+
+
+def _save_recipe_to_db(recipe_data: RecipeCreate, session: Session) -> Recipe:
+    return _save_recipes_to_db([recipe_data], session)[0]
 
 @app.post("/register", response_model=UserRead)
-def create_user(user: UserCreate, session: Session = Depends(get_session)):
-    existing_user = session.exec(select(User).where(User.email == user.email)).first()
+async def create_user(user: UserCreate, session: AsyncSession = Depends(get_async_session)):
+    existing_user = (await session.exec(select(User).where(User.email == user.email))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    # End the read so the connection goes back to the pool while the password is hashed
+    await session.commit()
+    hashed_password = await hash_password(user.password)
     new_user = User(email=user.email, hashed_password=hashed_password)
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Registered by a concurrent request while we were hashing
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await session.refresh(new_user)
     return new_user
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if not user or not user.hashed_password or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_async_session)):
+    user = (await session.exec(select(User).where(User.email == form_data.username))).first()
+    if not user or not user.hashed_password:
+        raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+    # End the read so the connection goes back to the pool while the password is checked
+    # (the session doesn't expire loaded objects on commit)
+    await session.commit()
+    verified, new_hash = await verify_and_update_password(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
-    access_token = create_access_token(data={"sub": user.email})
+    if new_hash:
+        # Hashed with older Argon2 settings: store it again with the current ones
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
+    access_token = create_access_token(data={"sub": str(user.id)})
     return Token(access_token=access_token, token_type="bearer")
 
 @app.post("/api/auth/google", response_model=Token)
@@ -115,7 +264,7 @@ def login_with_google(google_token: GoogleLoginRequest, session: Session = Depen
         # 1. Check if user exists with this Google ID
         user = session.exec(select(User).where(User.google_user_id == google_sub)).first()
         if user:
-            access_token = create_access_token(data={"sub": user.email})
+            access_token = create_access_token(data={"sub": str(user.id)})
             return Token(access_token=access_token, token_type="bearer")
 
         # 2. If not, check if user exists with this email
@@ -126,7 +275,8 @@ def login_with_google(google_token: GoogleLoginRequest, session: Session = Depen
             session.add(user)
             session.commit()
             session.refresh(user)
-            access_token = create_access_token(data={"sub": user.email})
+            invalidate_user(user.id)
+            access_token = create_access_token(data={"sub": str(user.id)})
             return Token(access_token=access_token, token_type="bearer")
 
         # 3. If no user exists at all, create a new one
@@ -139,7 +289,7 @@ def login_with_google(google_token: GoogleLoginRequest, session: Session = Depen
         session.commit()
         session.refresh(new_user)
         
-        access_token = create_access_token(data={"sub": new_user.email})
+        access_token = create_access_token(data={"sub": str(new_user.id)})
         return Token(access_token=access_token, token_type="bearer")
 
     except ValueError:
@@ -155,349 +305,899 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 
 @app.put("/users/me", response_model=UserRead)
 def update_user_me(user_update: UserUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    # current_user is a cached snapshot, so the change is made on a freshly loaded row
+    user = session.get(User, current_user.id)
     update_data = user_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
-        setattr(current_user, key, value)
-    session.add(current_user)
+        setattr(user, key, value)
+    session.add(user)
     session.commit()
-    session.refresh(current_user)
-    return current_user
+    session.refresh(user)
+    invalidate_user(user.id)
+    return user
 
 @app.get("/api/users/me/saved-recipes", response_model=List[RecipeResponse])
 def get_saved_recipes(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    # --- OPTIMIZATION: Use selectinload to eager load related data ---
-    user_with_recipes = session.exec(
-        select(User)
-        .where(User.id == current_user.id)
-        .options(
-            selectinload(User.saved_recipes)
-            .selectinload(Recipe.links)
-            .selectinload(RecipeIngredientLink.ingredient)
-        )
-    ).first()
-
-    if not user_with_recipes:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    response_recipes = []
-    for recipe in user_with_recipes.saved_recipes:
-        response_ingredients = [
-            IngredientInRecipe(ingredient_id=link.ingredient.id, name=link.ingredient.name, quantity=link.quantity)
-            for link in recipe.links
-        ]
-        
-        # Manually calculate average rating
-        avg_rating = 0
-        if recipe.rating_count > 0:
-            avg_rating = round(recipe.total_rating / recipe.rating_count, 1)
-
-        # Use .model_dump() for safe data extraction
-        recipe_data = recipe.model_dump()
-        recipe_data['average_rating'] = avg_rating
-        recipe_data['ingredients'] = response_ingredients
-
-        response_recipes.append(RecipeResponse(**recipe_data))
-        
-    return response_recipes
+    # The user is already known, so go straight from the link table to the recipes' stored JSON
+    bodies = session.exec(
+        select(RecipeReadModel.body)
+        .join(UserRecipeLink, UserRecipeLink.recipe_id == RecipeReadModel.recipe_id)
+        .where(UserRecipeLink.user_id == current_user.id)
+    ).all()
+    return Response(content=json_array(bodies), media_type="application/json")
+
+# --- Saved recipes and pantry: written straight to the link tables ---
+# Inserts skip rows that already exist and deletes are keyed on (user, item), so none of these
+# load the user's collection. Each returns how many rows it changed and leaves the commit to the caller.
+def _save_recipes_for_user(session: Session, user_id: int, recipe_ids: List[int]) -> int:
+    changed = 0
+    for chunk in chunked(recipe_ids):
+        # Selecting the ids from recipe drops any that don't exist
+        stmt = dialect_insert(session, UserRecipeLink).from_select(
+            ["user_id", "recipe_id"], select(literal(user_id), Recipe.id).where(Recipe.id.in_(chunk))
+        ).on_conflict_do_nothing()
+        changed += session.execute(stmt).rowcount
+    return changed
+
+def _unsave_recipes_for_user(session: Session, user_id: int, recipe_ids: List[int]) -> int:
+    changed = 0
+    for chunk in chunked(recipe_ids):
+        changed += session.execute(
+            delete(UserRecipeLink).where(UserRecipeLink.user_id == user_id, UserRecipeLink.recipe_id.in_(chunk))
+        ).rowcount
+    return changed
+
+def _add_to_pantry(session: Session, user_id: int, ingredient_ids: List[int]) -> int:
+    changed = 0
+    for chunk in chunked(ingredient_ids):
+        rows = [{"user_id": user_id, "ingredient_id": ingredient_id} for ingredient_id in chunk]
+        changed += session.execute(dialect_insert(session, UserPantryLink).values(rows).on_conflict_do_nothing()).rowcount
+    return changed
+
+def _remove_from_pantry(session: Session, user_id: int, ingredient_ids: List[int]) -> int:
+    changed = 0
+    for chunk in chunked(ingredient_ids):
+        changed += session.execute(
+            delete(UserPantryLink).where(UserPantryLink.user_id == user_id, UserPantryLink.ingredient_id.in_(chunk))
+        ).rowcount
+    return changed
 
 @app.post("/api/users/me/saved-recipes/{recipe_id}", status_code=201)
 def save_a_recipe(recipe_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    recipe = session.get(Recipe, recipe_id)
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    
-    # Eager load saved_recipes to avoid lazy loading issues
-    user = session.exec(
-        select(User).where(User.id == current_user.id).options(selectinload(User.saved_recipes))
-    ).first()
-
-    if recipe not in user.saved_recipes:
-        user.saved_recipes.append(recipe)
-        session.add(user)
-        session.commit()
+    if not _save_recipes_for_user(session, current_user.id, [recipe_id]):
+        # Nothing inserted: either already saved or no such recipe
+        if not session.get(Recipe, recipe_id):
+            raise HTTPException(status_code=404, detail="Recipe not found")
+    session.commit()
     return {"message": "Recipe saved successfully"}
 
 @app.delete("/api/users/me/saved-recipes/{recipe_id}", status_code=204)
 def unsave_a_recipe(recipe_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    recipe = session.get(Recipe, recipe_id)
-    if not recipe:
-        raise HTTPException(status_code=404, detail="Recipe not found")
-    
-    # Eager load saved_recipes
-    user = session.exec(
-        select(User).where(User.id == current_user.id).options(selectinload(User.saved_recipes))
-    ).first()
-    
-    if recipe in user.saved_recipes:
-        user.saved_recipes.remove(recipe)
-        session.add(user)
-        session.commit()
+    if not _unsave_recipes_for_user(session, current_user.id, [recipe_id]):
+        if not session.get(Recipe, recipe_id):
+            raise HTTPException(status_code=404, detail="Recipe not found")
+    session.commit()
     return
 
+@app.put("/api/users/me/saved-recipes", response_model=BulkUpdateResult)
+def update_saved_recipes(changes: SavedRecipesUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """Saves and unsaves many recipes in one transaction. Unknown recipe ids are skipped."""
+    added = _save_recipes_for_user(session, current_user.id, changes.add)
+    removed = _unsave_recipes_for_user(session, current_user.id, changes.remove)
+    session.commit()
+    return BulkUpdateResult(added=added, removed=removed)
+
 @app.get("/api/pantry", response_model=List[PantryItem])
-def get_pantry_items(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    # Eager load pantry_items
-    user_with_pantry = session.exec(
-        select(User).where(User.id == current_user.id).options(selectinload(User.pantry_items))
-    ).first()
-    return [PantryItem(ingredient_id=ing.id, name=ing.name, category=ing.category) for ing in user_with_pantry.pantry_items]
+async def get_pantry_items(session: AsyncSession = Depends(get_async_session), current_user: User = Depends(get_current_user)):
+    result = await session.exec(
+        select(Ingredient.id, Ingredient.name, Ingredient.category)
+        .join(UserPantryLink, UserPantryLink.ingredient_id == Ingredient.id)
+        .where(UserPantryLink.user_id == current_user.id)
+    )
+    return [PantryItem(ingredient_id=id, name=name, category=category) for id, name, category in result.all()]
 
 @app.post("/api/pantry", response_model=PantryItem)
 def add_pantry_item(item: PantryItemCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
     ingredient = get_or_create_ingredient(item.ingredient_name, session)
-    
-    user = session.exec(
-        select(User).where(User.id == current_user.id).options(selectinload(User.pantry_items))
-    ).first()
-
-    if ingredient in user.pantry_items:
+    if not _add_to_pantry(session, current_user.id, [ingredient.id]):
         raise HTTPException(status_code=400, detail="Item already in pantry")
-        
-    user.pantry_items.append(ingredient)
-    session.add(user)
     session.commit()
     return PantryItem(ingredient_id=ingredient.id, name=ingredient.name, category=ingredient.category)
 
+@app.post("/api/pantry/bulk", response_model=BulkUpdateResult)
+def update_pantry_items(changes: PantryBulkUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    """Adds ingredients by name (creating unknown ones) and removes them by id, in one transaction."""
+    ingredients = resolve_ingredients(((name, None) for name in changes.add), session)
+    added = _add_to_pantry(session, current_user.id, [ingredient.id for ingredient in ingredients.values()])
+    removed = _remove_from_pantry(session, current_user.id, changes.remove)
+    session.commit()
+    return BulkUpdateResult(added=added, removed=removed)
+
 @app.delete("/api/pantry/{ingredient_id}", status_code=204)
 def remove_pantry_item(ingredient_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    ingredient = session.get(Ingredient, ingredient_id)
-    if not ingredient:
-        raise HTTPException(status_code=404, detail="Ingredient not found")
-    
-    user = session.exec(
-        select(User).where(User.id == current_user.id).options(selectinload(User.pantry_items))
-    ).first()
-
-    if ingredient in user.pantry_items:
-        user.pantry_items.remove(ingredient)
-        session.add(user)
-        session.commit()
+    if not _remove_from_pantry(session, current_user.id, [ingredient_id]):
+        if not session.get(Ingredient, ingredient_id):
+            raise HTTPException(status_code=404, detail="Ingredient not found")
+    session.commit()
 
 @app.get("/api/ingredients/search", response_model=List[PantryItem])
 def search_ingredients(q: str, session: Session = Depends(get_session)):
     if not q or len(q) < 2:
         return []
-    
-    search_term = f"%{q.lower()}%"
-    ingredients = session.exec(
-        select(Ingredient)
-        .where(
-            Ingredient.is_staple == True,
-            func.lower(Ingredient.name).like(search_term)
-        )
-        .limit(10)
-    ).all()
-    
-    return [PantryItem(ingredient_id=ing.id, name=ing.name) for ing in ingredients]
+
+    matches = ingredient_search_index.search(session, q, limit=10)
+    return [PantryItem(ingredient_id=ing.id, name=ing.name) for ing in matches]
 
 @app.get("/api/ingredients/staples", response_model=Dict[str, List[PantryItem]])
-def get_staple_ingredients(session: Session = Depends(get_session)):
-    staples = session.exec(select(Ingredient).where(Ingredient.is_staple == True)).all()
-    
-    categorized_staples = {}
-    for staple in staples:
-        category = staple.category or "Other"
-        if category not in categorized_staples:
-            categorized_staples[category] = []
-        
-        categorized_staples[category].append(PantryItem(
-            ingredient_id=staple.id,
-            name=staple.name,
-            category=staple.category
-        ))
-    return categorized_staples
+def get_staple_ingredients(request: Request, session: Session = Depends(get_session)):
+    key = response_cache.key(request, ("ingredients",))
+    cached = response_cache.get(key)
+    if cached is None:
+        staples = session.exec(select(Ingredient).where(Ingredient.is_staple == True)).all()
+
+        categorized_staples = {}
+        for staple in staples:
+            category = staple.category or "Other"
+            if category not in categorized_staples:
+                categorized_staples[category] = []
+
+            categorized_staples[category].append(PantryItem(
+                ingredient_id=staple.id,
+                name=staple.name,
+                category=staple.category
+            ).model_dump())
+        cached = response_cache.put(key, categorized_staples)
+    return response_cache.respond(request, cached, STATIC)
 
 @app.get("/")
 def read_root(): return {"message": "Welcome!"}
 
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return {"ai": ai_cache.stats(), "auth": auth_cache_stats(), "responses": response_cache.stats()}
+
+# --- AI recipe generation ---
+def _generated_recipes_key(request: GenerateRequest) -> str:
+    """ai_cache key of the ids that recipes generated for these inputs were saved under."""
+    return generation_cache_key(request.specials, request.preferences, request.pantry_items, kind="generated-recipe-ids")
+
+# The generate endpoints are async, so these open their own sessions and are run with
+# run_in_threadpool: every query, commit and rollback stays off the event loop.
+def _find_generated_recipes(key: str) -> List[Dict[str, Any]]:
+    """
+    Recipes already saved for a generation request, in the order they were generated. Ones deleted
+    since are left out; empty if there are none left, so the request generates recipes again.
+    """
+    recipe_ids = ai_cache.get(key) or []
+    if not recipe_ids:
+        return []
+    with Session(engine) as session:
+        bodies = dict(session.exec(
+            select(RecipeReadModel.recipe_id, RecipeReadModel.body).where(RecipeReadModel.recipe_id.in_(recipe_ids))
+        ).all())
+    return [json.loads(bodies[recipe_id]) for recipe_id in recipe_ids if recipe_id in bodies]
+
+def _save_generated_recipes(recipes: List[RecipeCreate]) -> List[int]:
+    # A failed save is rolled back when the session closes
+    with Session(engine) as session:
+        return [recipe.id for recipe in _save_recipes_to_db(recipes, session)]
+
 @app.post("/api/generate-recipes")
-def generate_recipes_endpoint(request: GenerateRequest, session: Session = Depends(get_session)):
-    ai_generated_recipes = generate_recipes_from_specials(
+async def generate_recipes_endpoint(request: GenerateRequest, bypass_cache: bool = Query(False)):
+    saved_key = _generated_recipes_key(request)
+    if not bypass_cache:
+        existing = await run_in_threadpool(_find_generated_recipes, saved_key)
+        if existing:
+            return {"message": f"Found {len(existing)} recipes already generated from these specials."}
+
+    ai_generated_recipes = await generate_recipes_from_specials(
         specials_list=request.specials,
         preferences=request.preferences,
-        pantry_items=request.pantry_items
+        pantry_items=request.pantry_items,
+        use_cache=not bypass_cache
     )
-    saved_recipes_count = 0
+    valid_recipes = []
     for recipe_dict in ai_generated_recipes:
         try:
-            recipe_data = RecipeCreate(**recipe_dict)
-            _save_recipe_to_db(recipe_data, session)
-            saved_recipes_count += 1
+            valid_recipes.append(RecipeCreate(**recipe_dict))
         except Exception as e:
-            print(f"Could not validate or save AI recipe: {e}")
+            print(f"Could not validate AI recipe: {e}")
+
+    saved_recipes_count = 0
+    try:
+        recipe_ids = await run_in_threadpool(_save_generated_recipes, valid_recipes)
+        saved_recipes_count = len(recipe_ids)
+        if recipe_ids:
+            ai_cache.set(saved_key, recipe_ids)
+    except Exception as e:
+        print(f"Could not save AI recipes: {e}")
     return {"message": f"Successfully generated and saved {saved_recipes_count} new recipes."}
 
 
+def _sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/generate-recipes/stream")
+async def generate_recipes_stream_endpoint(request: GenerateRequest, bypass_cache: bool = Query(False)):
+    """
+    Server-Sent Events version of /api/generate-recipes. Each recipe is validated, saved and
+    sent as a `recipe` event (with its new id) as soon as the model finishes writing it,
+    followed by a final `done` event. Recipes already saved for the same inputs are sent
+    again, with their ids, instead of being saved twice.
+    """
+    saved_key = _generated_recipes_key(request)
+
+    async def event_stream():
+        existing = [] if bypass_cache else await run_in_threadpool(_find_generated_recipes, saved_key)
+        if existing:
+            for recipe in existing:
+                yield _sse_event("recipe", {"id": recipe["id"], **RecipeCreate(**recipe).model_dump()})
+            yield _sse_event("done", {
+                "saved": 0,
+                "message": f"Found {len(existing)} recipes already generated from these specials."
+            })
+            return
+
+        recipe_ids = []
+        try:
+            async for recipe_dict in stream_recipes_from_specials(
+                specials_list=request.specials,
+                preferences=request.preferences,
+                pantry_items=request.pantry_items,
+                use_cache=not bypass_cache
+            ):
+                try:
+                    recipe_data = RecipeCreate(**recipe_dict)
+                    recipe_id = (await run_in_threadpool(_save_generated_recipes, [recipe_data]))[0]
+                except Exception as e:
+                    print(f"Could not validate or save AI recipe: {e}")
+                    yield _sse_event("error", {"detail": "Could not validate or save a generated recipe."})
+                    continue
+                recipe_ids.append(recipe_id)
+                yield _sse_event("recipe", {"id": recipe_id, **recipe_data.model_dump()})
+        except Exception as e:
+            print(f"An unexpected error occurred during streamed recipe generation: {e}")
+            yield _sse_event("error", {"detail": "Recipe generation failed."})
+        if recipe_ids:
+            ai_cache.set(saved_key, recipe_ids)
+        yield _sse_event("done", {
+            "saved": len(recipe_ids),
+            "message": f"Successfully generated and saved {len(recipe_ids)} new recipes."
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/prices/today", response_model=List[PriceHistoryRead])
-def get_todays_prices(session: Session = Depends(get_session)):
+async def get_todays_prices(request: Request, session: AsyncSession = Depends(get_async_session)):
     today = date.today()
-    db_prices = session.exec(
-        select(PriceHistory)
-        .where(PriceHistory.date_recorded == today)
-        .options(selectinload(PriceTopping.ingredient)) # Typo from original, fixed to PriceHistory
-    ).all()
-    
-    return [
-        PriceHistoryRead(
-            id=p.id,
-            ingredient_id=p.ingredient.id,
-            date_recorded=p.date_recorded.isoformat(),
-            price=p.price,
-            store=p.store,
-            ingredient_name=p.ingredient.name,
-            category=p.ingredient.category
-        ) for p in db_prices
-    ]
+    key = response_cache.key(request, ("prices",), today)
+    cached = response_cache.get(key)
+    if cached is None:
+        result = await session.exec(
+            select(PriceHistory)
+            .where(PriceHistory.date_recorded == today)
+            .options(selectinload(PriceHistory.ingredient))
+        )
+        cached = response_cache.put(key, [
+            PriceHistoryRead(
+                id=p.id,
+                ingredient_id=p.ingredient.id,
+                date_recorded=p.date_recorded.isoformat(),
+                price=p.price,
+                store=p.store,
+                ingredient_name=p.ingredient.name,
+                category=p.ingredient.category,
+                price_cents=p.price_cents,
+                unit_price_cents=p.unit_price_cents,
+                unit=p.unit
+            ).model_dump() for p in result.all()
+        ])
+    return response_cache.respond(request, cached)
+
+# --- Price ingest: one price per ingredient, store and day ---
+PRICE_UPSERT_COLUMNS = ("price", "price_cents", "unit_price_cents", "unit")
+
+def _upsert_prices(session: Session, rows: List[Dict[str, Any]]) -> List[str]:
+    """
+    Writes PriceHistory rows keyed on (ingredient_id, store, date_recorded): new keys are
+    inserted, a changed price overwrites that day's row and an unchanged one isn't written.
+    Rows apply in order, so the last of several for one key wins. Returns "created", "updated"
+    or "unchanged" for each row and leaves the commit to the caller.
+    """
+    dates = list({row["date_recorded"] for row in rows})
+    current: Dict[Tuple[int, str, date], str] = {}
+    for chunk in chunked([row["ingredient_id"] for row in rows]):
+        result = session.execute(
+            select(PriceHistory.ingredient_id, PriceHistory.store, PriceHistory.date_recorded, PriceHistory.price)
+            .where(PriceHistory.ingredient_id.in_(chunk), PriceHistory.date_recorded.in_(dates))
+        )
+        current.update(((ingredient_id, store, day), price) for ingredient_id, store, day, price in result)
+
+    statuses = []
+    writes: Dict[Tuple[int, str, date], Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["ingredient_id"], row["store"], row["date_recorded"])
+        previous = current.get(key)
+        if previous == row["price"]:
+            statuses.append("unchanged")
+            continue
+        statuses.append("created" if previous is None else "updated")
+        current[key] = row["price"]
+        writes[key] = row
+
+    if writes:
+        stmt = dialect_insert(session, PriceHistory)
+        # The WHERE keeps a concurrent ingest of the same price from rewriting the row
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["ingredient_id", "store", "date_recorded"],
+                set_={column: stmt.excluded[column] for column in PRICE_UPSERT_COLUMNS},
+                where=PriceHistory.price != stmt.excluded.price,
+            ),
+            list(writes.values())
+        )
+    return statuses
 
 @app.post("/api/prices", response_model=PriceHistoryRead)
 def create_price_record(price_data: PriceHistoryCreate, session: Session = Depends(get_session)):
+    """Records today's price of an ingredient at a store, replacing any price already recorded for today."""
     ingredient = get_or_create_ingredient(price_data.ingredient_name, session, category=price_data.category)
-    
-    new_price_record = PriceHistory(
-        ingredient_id=ingredient.id,
-        price=price_data.price,
-        store=price_data.store
-    )
-    session.add(new_price_record)
+
+    today = date.today()
+    parsed = parse_price(price_data.price)
+    status, = _upsert_prices(session, [{
+        "ingredient_id": ingredient.id,
+        "date_recorded": today,
+        "price": price_data.price,
+        "store": price_data.store,
+        **parsed._asdict(),
+    }])
+    if status != "unchanged":
+        refresh_rollups(session, [(ingredient.id, price_data.store, today)])
     session.commit()
-    session.refresh(new_price_record)
-    
+    if status != "unchanged":
+        price_book.record([(ingredient.id, price_data.store, today, parsed)])
+        response_cache.bump("prices")
+
+    price_record = session.exec(
+        select(PriceHistory).where(
+            PriceHistory.ingredient_id == ingredient.id,
+            PriceHistory.store == price_data.store,
+            PriceHistory.date_recorded == today
+        )
+    ).one()
     return PriceHistoryRead(
-        id=new_price_record.id,
+        id=price_record.id,
         ingredient_id=ingredient.id,
-        date_recorded=new_price_record.date_recorded.isoformat(),
-        price=new_price_record.price,
-        store=new_price_record.store,
+        date_recorded=price_record.date_recorded.isoformat(),
+        price=price_record.price,
+        store=price_record.store,
         ingredient_name=ingredient.name,
-        category=ingredient.category
+        category=ingredient.category,
+        price_cents=price_record.price_cents,
+        unit_price_cents=price_record.unit_price_cents,
+        unit=price_record.unit
+    )
+
+@app.post("/api/prices/bulk", response_model=PriceBulkResponse)
+def create_price_records_bulk(records: List[Dict[str, Any]] = Body(...), session: Session = Depends(get_session)):
+    """
+    Ingests a JSON array of PriceHistoryCreate objects as today's prices, in a single transaction.
+    Each row is "created", "updated" (today's price for that ingredient and store changed) or
+    "unchanged", so re-running a scrape only writes what changed. Invalid rows are reported
+    individually and do not abort the rest of the batch.
+    """
+    results: List[PriceBulkRowResult] = []
+    valid_rows: List[Tuple[int, PriceHistoryCreate]] = []
+    for index, record in enumerate(records):
+        try:
+            valid_rows.append((index, PriceHistoryCreate.model_validate(record)))
+        except Exception as e:
+            results.append(PriceBulkRowResult(index=index, status="invalid", detail=str(e)))
+
+    if valid_rows:
+        try:
+            ingredients = resolve_ingredients(
+                ((row.ingredient_name, row.category) for _, row in valid_rows), session
+            )
+            today = date.today()
+            price_rows = []
+            parsed_prices = []
+            for _, row in valid_rows:
+                parsed = parse_price(row.price)
+                price_rows.append({
+                    "ingredient_id": ingredients[normalize_ingredient_name(row.ingredient_name)].id,
+                    "date_recorded": today,
+                    "price": row.price,
+                    "store": row.store,
+                    **parsed._asdict(),
+                })
+                parsed_prices.append(parsed)
+
+            recorded = []
+            statuses = _upsert_prices(session, price_rows)
+            for (index, _), price_row, parsed, status in zip(valid_rows, price_rows, parsed_prices, statuses):
+                results.append(PriceBulkRowResult(index=index, status=status, ingredient_id=price_row["ingredient_id"]))
+                if status != "unchanged":
+                    recorded.append((price_row["ingredient_id"], price_row["store"], today, parsed))
+            refresh_rollups(session, ((ingredient_id, store, day) for ingredient_id, store, day, _ in recorded))
+            session.commit()
+            price_book.record(recorded)
+            # Resolving the ingredients may also have filled in categories
+            response_cache.bump("prices", "ingredients")
+        except Exception as e:
+            session.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+    results.sort(key=lambda r: r.index)
+    counts = {status: 0 for status in ("created", "updated", "unchanged", "invalid")}
+    for r in results:
+        counts[r.status] += 1
+    return PriceBulkResponse(
+        created=counts["created"], updated=counts["updated"], unchanged=counts["unchanged"],
+        failed=counts["invalid"], results=results
     )
 
 @app.delete("/api/prices/today")
 def delete_todays_prices(session: Session = Depends(get_session)):
     today = date.today()
     try:
-        prices_to_delete = session.exec(select(PriceHistory).where(PriceHistory.date_recorded == today)).all()
-        for price in prices_to_delete:
-            session.delete(price)
+        cleared = session.exec(
+            select(PriceHistory.ingredient_id, PriceHistory.store).where(PriceHistory.date_recorded == today)
+        ).all()
+        session.exec(delete(PriceHistory).where(PriceHistory.date_recorded == today))
+        refresh_rollups(session, {(ingredient_id, store, today) for ingredient_id, store in cleared})
         session.commit()
+        price_book.invalidate()
+        response_cache.bump("prices")
         return {"message": "Today's price records have been cleared."}
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/ingredient/{ingredient_id}/price-history", response_model=List[PriceHistoryRead])
-def get_price_history_for_ingredient(ingredient_id: int, session: Session = Depends(get_session)):
-    history = session.exec(
+async def get_price_history_for_ingredient(ingredient_id: int, session: AsyncSession = Depends(get_async_session)):
+    ingredient = await session.get(Ingredient, ingredient_id)
+    if not ingredient:
+        raise HTTPException(status_code=404, detail="Ingredient not found.")
+    result = await session.exec(
         select(PriceHistory)
         .where(PriceHistory.ingredient_id == ingredient_id)
         .order_by(PriceHistory.date_recorded.desc())
-        .options(selectinload(PriceHistory.ingredient))
-    ).all()
+    )
 
-    if not history:
-        ingredient = session.get(Ingredient, ingredient_id)
-        if not ingredient:
-             raise HTTPException(status_code=404, detail="Ingredient not found.")
-        # Return empty list if ingredient exists but has no history
-        return []
-        
     return [
         PriceHistoryRead(
             id=h.id,
-            ingredient_id=h.ingredient.id,
+            ingredient_id=ingredient.id,
             date_recorded=h.date_recorded.isoformat(),
             price=h.price,
             store=h.store,
-            ingredient_name=h.ingredient.name
-        ) for h in history
+            ingredient_name=ingredient.name,
+            price_cents=h.price_cents,
+            unit_price_cents=h.unit_price_cents,
+            unit=h.unit
+        ) for h in result.all()
     ]
 
+PRICE_HISTORY_MAX_INGREDIENTS = 100
+PRICE_HISTORY_RESOLUTIONS = ("raw", "week", "month", "auto")
+# resolution=auto serves raw rows for spans up to this many days, weekly rollups up to the next
+PRICE_HISTORY_AUTO_RAW_DAYS = 180
+PRICE_HISTORY_AUTO_WEEK_DAYS = 4 * 365
+
+async def _auto_price_resolution(session: AsyncSession, ids: List[int], from_date: Optional[date],
+                                 to_date: Optional[date]) -> str:
+    if from_date is None:
+        # Monthly rollups reach back furthest, past any compacted raw rows
+        from_date = (await session.exec(
+            select(func.min(PriceRollup.period_start))
+            .where(PriceRollup.ingredient_id.in_(ids), PriceRollup.resolution == "month")
+        )).one()
+        if from_date is None:
+            return "raw"
+    days = ((to_date or date.today()) - from_date).days
+    if days <= PRICE_HISTORY_AUTO_RAW_DAYS:
+        return "raw"
+    return "week" if days <= PRICE_HISTORY_AUTO_WEEK_DAYS else "month"
+
+@app.get("/api/price-history", response_model=List[PriceSeries])
+async def get_price_history(
+    ingredient_ids: str = Query(...),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    store: Optional[str] = Query(None),
+    resolution: str = Query("raw"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """
+    Price series for several ingredients in one request: one per ingredient and store, in the
+    order the ingredients were asked for. `ingredient_ids` is comma-separated and `from`/`to`
+    are inclusive dates. Prices that couldn't be parsed are left out.
+
+    `resolution` is "raw" (every recorded price), "week" or "month" (one point per period from
+    the rollups: prices are averages, with min/max/last alongside), or "auto" to pick by the
+    span asked for. Raw rows past the retention window only survive in the rollups.
+    """
+    if resolution not in PRICE_HISTORY_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(PRICE_HISTORY_RESOLUTIONS)}.")
+    try:
+        ids = list(dict.fromkeys(int(i) for i in ingredient_ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ingredient_ids must be comma-separated integers.")
+    if not ids or len(ids) > PRICE_HISTORY_MAX_INGREDIENTS:
+        raise HTTPException(
+            status_code=400, detail=f"Give between 1 and {PRICE_HISTORY_MAX_INGREDIENTS} ingredient ids."
+        )
+    if resolution == "auto":
+        resolution = await _auto_price_resolution(session, ids, from_date, to_date)
+
+    series: Dict[Tuple[int, str], Dict[str, list]] = {}
+    if resolution == "raw":
+        conditions = [PriceHistory.ingredient_id.in_(ids), PriceHistory.price_cents.is_not(None)]
+        if from_date is not None:
+            conditions.append(PriceHistory.date_recorded >= from_date)
+        if to_date is not None:
+            conditions.append(PriceHistory.date_recorded <= to_date)
+        if store is not None:
+            conditions.append(PriceHistory.store == store)
+        # Only the columns the series need, read in (ingredient_id, date_recorded) index order
+        result = await session.exec(
+            select(PriceHistory.ingredient_id, PriceHistory.store, PriceHistory.date_recorded, PriceHistory.price_cents)
+            .where(*conditions)
+            .order_by(PriceHistory.ingredient_id, PriceHistory.date_recorded, PriceHistory.id)
+        )
+        for ingredient_id, price_store, date_recorded, price_cents in result:
+            key = (ingredient_id, price_store)
+            if key not in series:
+                series[key] = {"dates": [], "prices": []}
+            columns = series[key]
+            columns["dates"].append(date_recorded.isoformat())
+            columns["prices"].append(price_cents)
+    else:
+        conditions = [PriceRollup.ingredient_id.in_(ids), PriceRollup.resolution == resolution]
+        if from_date is not None:
+            # Includes the period from_date falls in
+            conditions.append(PriceRollup.period_start >= period_bounds(resolution, from_date)[0])
+        if to_date is not None:
+            conditions.append(PriceRollup.period_start <= to_date)
+        if store is not None:
+            conditions.append(PriceRollup.store == store)
+        result = await session.exec(
+            select(
+                PriceRollup.ingredient_id, PriceRollup.store, PriceRollup.period_start, PriceRollup.sum_cents,
+                PriceRollup.count, PriceRollup.min_cents, PriceRollup.max_cents, PriceRollup.last_cents
+            )
+            .where(*conditions)
+            .order_by(PriceRollup.ingredient_id, PriceRollup.store, PriceRollup.period_start)
+        )
+        for ingredient_id, price_store, period_start, sum_cents, count, min_cents, max_cents, last_cents in result:
+            key = (ingredient_id, price_store)
+            if key not in series:
+                series[key] = {"dates": [], "prices": [], "min_prices": [], "max_prices": [], "last_prices": []}
+            columns = series[key]
+            columns["dates"].append(period_start.isoformat())
+            columns["prices"].append(round(sum_cents / count))
+            columns["min_prices"].append(min_cents)
+            columns["max_prices"].append(max_cents)
+            columns["last_prices"].append(last_cents)
+    if not series:
+        return []
+
+    names = dict((await session.exec(
+        select(Ingredient.id, Ingredient.name).where(Ingredient.id.in_({i for i, _ in series}))
+    )).all())
+    order = {ingredient_id: index for index, ingredient_id in enumerate(ids)}
+    return JSONResponse(content=[
+        {
+            "ingredient_id": ingredient_id,
+            "ingredient_name": names.get(ingredient_id, ""),
+            "store": price_store,
+            "resolution": resolution,
+            **columns,
+        }
+        for (ingredient_id, price_store), columns in sorted(
+            series.items(), key=lambda item: (order[item[0][0]], item[0][1])
+        )
+    ])
+
+@app.post("/api/basket/price", response_model=BasketPriceResponse)
+def price_basket(request: BasketPriceRequest, session: Session = Depends(get_session)):
+    """Prices a shopping list (ingredient ids) or a recipe's ingredients against each store's latest prices."""
+    if (request.ingredient_ids is None) == (request.recipe_id is None):
+        raise HTTPException(status_code=400, detail="Provide either ingredient_ids or recipe_id.")
+    ingredient_ids = request.ingredient_ids
+    if request.recipe_id is not None:
+        if session.exec(select(Recipe.id).where(Recipe.id == request.recipe_id)).first() is None:
+            raise HTTPException(status_code=404, detail="Recipe not found.")
+        ingredient_ids = session.exec(
+            select(RecipeIngredientLink.ingredient_id).where(RecipeIngredientLink.recipe_id == request.recipe_id)
+        ).all()
+
+    quote = price_book.quote(session, ingredient_ids)
+    names = dict(session.exec(
+        select(Ingredient.id, Ingredient.name).where(Ingredient.id.in_(list(quote.cheapest)))
+    ).all()) if quote.cheapest else {}
+
+    return BasketPriceResponse(
+        stores=[
+            StoreBasketTotal(store=s.store, total_cents=s.total_cents, missing_ingredient_ids=s.missing_ingredient_ids)
+            for s in quote.stores
+        ],
+        cheapest_split=[
+            BasketItemPrice(
+                ingredient_id=ingredient_id,
+                ingredient_name=names.get(ingredient_id, ""),
+                store=price.store,
+                price_cents=price.price_cents,
+                unit_price_cents=price.unit_price_cents,
+                unit=price.unit,
+                date_recorded=price.date_recorded.isoformat()
+            ) for ingredient_id, price in quote.cheapest.items()
+        ],
+        cheapest_split_total_cents=sum(price.price_cents for price in quote.cheapest.values()),
+        unpriced_ingredient_ids=quote.unpriced_ingredient_ids
+    )
+
+# Tags matching case-insensitively are one tag; the first spelling (alphabetically) is shown
+_tag_display = func.min(RecipeTag.tag)
+
 @app.get("/api/tags", response_model=List[str])
-def get_all_tags(session: Session = Depends(get_session)):
-    all_recipes = session.exec(select(Recipe)).all()
-    all_tags = set()
-    for recipe in all_recipes:
-        for tag in recipe.tags:
-            all_tags.add(tag)
-    return sorted(list(all_tags))
+async def get_all_tags(request: Request, session: AsyncSession = Depends(get_async_session)):
+    key = response_cache.key(request, ("recipes",))
+    cached = response_cache.get(key)
+    if cached is None:
+        result = await session.exec(
+            select(_tag_display).group_by(RecipeTag.tag_normalized).order_by(RecipeTag.tag_normalized)
+        )
+        cached = response_cache.put(key, result.all())
+    return response_cache.respond(request, cached)
+
+@app.get("/api/tags/counts", response_model=List[TagCount])
+async def get_tag_counts(session: AsyncSession = Depends(get_async_session)):
+    """Every tag with the number of recipes carrying it, most used first."""
+    result = await session.exec(
+        select(_tag_display, func.count())
+        .group_by(RecipeTag.tag_normalized)
+        .order_by(func.count().desc(), RecipeTag.tag_normalized)
+    )
+    return [TagCount(tag=tag, count=count) for tag, count in result.all()]
+
+# --- Recipe listing: keyset pagination and field projection ---
+RECIPE_PAGE_SIZE = 50
+RECIPE_MAX_PAGE_SIZE = 200
+RECIPE_FIELDS = ("id", "title", "description", "instructions", "ingredients", "tags",
+                 "total_rating", "rating_count", "average_rating")
+# fields=summary: enough for list views, without instructions or ingredients
+RECIPE_SUMMARY_FIELDS = ("id", "title", "description", "tags", "rating_count", "average_rating")
+
+def _parse_recipe_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return RECIPE_FIELDS
+    if fields == "summary":
+        return RECIPE_SUMMARY_FIELDS
+    requested = {field.strip() for field in fields.split(",")} - {""}
+    unknown = requested - set(RECIPE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown recipe fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in RECIPE_FIELDS if field in requested | {"id"})
+
+def _encode_cursor(sort_by: Optional[str], values: List[Any]) -> str:
+    raw = json.dumps([sort_by, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _is_cursor_value(value: Any, value_type: type) -> bool:
+    # bool is an int to isinstance; out-of-range ints and NaN can't be compared with the column
+    if isinstance(value, bool):
+        return False
+    if value_type is float:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, int) and -2 ** 63 <= value < 2 ** 63
+
+def _decode_cursor(cursor: str, sort_by: Optional[str], value_types: Tuple[type, ...]) -> List[Any]:
+    """
+    Values of the last row of the previous page, one of each of value_types; the cursor only
+    works with the sort it came from.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        data = None
+    if (
+        not isinstance(data, list) or len(data) != len(value_types) + 1 or data[0] != sort_by
+        or not all(_is_cursor_value(value, value_type) for value, value_type in zip(data[1:], value_types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor for this sort order.")
+    return data[1:]
+
+def _recipe_to_dict(recipe: Recipe, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    data = {}
+    for field in fields:
+        if field == "ingredients":
+            data[field] = [
+                {"name": link.ingredient.name, "quantity": link.quantity, "ingredient_id": link.ingredient.id}
+                for link in recipe.links
+            ]
+        elif field == "average_rating":
+            data[field] = round(recipe.average_rating, 1)
+        else:
+            data[field] = getattr(recipe, field)
+    return data
 
 @app.get("/api/recipes", response_model=List[RecipeResponse])
-def get_recipes(
-    session: Session = Depends(get_session),
+async def get_recipes(
+    request: Request,
+    session: AsyncSession = Depends(get_async_session),
     min_rating: Optional[float] = Query(None, ge=1, le=5),
     sort_by: Optional[str] = Query(None),
-    tags: Optional[str] = Query(None)
+    tags: Optional[str] = Query(None),
+    limit: int = Query(RECIPE_PAGE_SIZE, ge=1, le=RECIPE_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None)
 ):
-    query = select(Recipe).options(
-        selectinload(Recipe.links).selectinload(RecipeIngredientLink.ingredient)
-    )
+    """
+    One page of recipes. X-Total-Count has the number of recipes matching the filters and
+    X-Next-Cursor (absent on the last page) is passed back as `cursor` for the next page.
+    `fields` is a comma-separated subset of the response fields, or "summary". Pages are
+    cached until a recipe or rating changes.
+    """
+    selected_fields = _parse_recipe_fields(fields)
+    key = response_cache.key(request, ("recipes",))
+    cached = response_cache.get(key)
+    if cached is not None:
+        return response_cache.respond(request, cached)
+
+    conditions = []
+    if tags:
+        selected_tags = {normalize_tag(tag) for tag in tags.split(',')} - {""}
+        if selected_tags:
+            # Recipes holding every selected tag, answered from the tag index
+            tagged = (
+                select(RecipeTag.recipe_id)
+                .where(RecipeTag.tag_normalized.in_(selected_tags))
+                .group_by(RecipeTag.recipe_id)
+                .having(func.count() == len(selected_tags))
+            )
+            conditions.append(Recipe.id.in_(tagged))
 
     if min_rating is not None:
-        average_rating = func.coalesce(Recipe.total_rating / func.nullif(Recipe.rating_count, 0), 0)
-        query = query.where(average_rating >= min_rating)
-
-    if sort_by is not None:
-        average_rating = func.coalesce(Recipe.total_rating / func.nullif(Recipe.rating_count, 0), 0)
-        if sort_by == "rating_asc":
-            query = query.order_by(average_rating.asc())
-        elif sort_by == "rating_desc":
-            query = query.order_by(average_rating.desc())
-            
-    db_recipes = session.exec(query).all()
+        conditions.append(Recipe.average_rating >= min_rating)
 
-    if tags:
-        selected_tags = {tag.strip().lower() for tag in tags.split(',')}
-        db_recipes = [
-            recipe for recipe in db_recipes
-            if selected_tags.issubset({t.lower() for t in recipe.tags})
-        ]
-
-    response_recipes = []
-    for recipe in db_recipes:
-        response_ingredients = [
-            IngredientInRecipe(ingredient_id=link.ingredient.id, name=link.ingredient.name, quantity=link.quantity)
-            for link in recipe.links
-        ]
-        
-        avg_rating = 0
-        if recipe.rating_count > 0:
-            avg_rating = round(recipe.total_rating / recipe.rating_count, 1)
+    # The id tie-break makes the order total, so pages never skip or repeat rows;
+    # (average_rating, id) is indexed, so both the filter and the rating sorts range-scan it
+    if sort_by in ("rating_asc", "rating_desc"):
+        sort_keys = (Recipe.average_rating, Recipe.id)
+        cursor_types = (float, int)
+    else:
+        sort_by = None
+        sort_keys = (Recipe.id,)
+        cursor_types = (int,)
+    descending = sort_by == "rating_desc"
+
+    total = (await session.exec(select(func.count()).select_from(Recipe).where(*conditions))).one()
+
+    # Whole recipes come ready-made from the read model; other field sets are built from the columns they need
+    from_read_model = selected_fields == RECIPE_FIELDS
+    if from_read_model:
+        query = (
+            select(RecipeReadModel.body, *sort_keys)
+            .select_from(Recipe)
+            .join(RecipeReadModel, RecipeReadModel.recipe_id == Recipe.id)
+            .where(*conditions)
+        )
+    else:
+        columns = [getattr(Recipe, field) for field in selected_fields if field in Recipe.model_fields]
+        query = select(Recipe, *sort_keys).where(*conditions).options(load_only(*columns))
+        if "ingredients" in selected_fields:
+            query = query.options(selectinload(Recipe.links).selectinload(RecipeIngredientLink.ingredient))
+    if cursor:
+        last = tuple_(*_decode_cursor(cursor, sort_by, cursor_types))
+        query = query.where(tuple_(*sort_keys) < last if descending else tuple_(*sort_keys) > last)
+    query = query.order_by(*(key.desc() if descending else key.asc() for key in sort_keys)).limit(limit + 1)
+
+    rows = (await session.exec(query)).all()
+
+    headers = {"X-Total-Count": str(total)}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _encode_cursor(sort_by, list(rows[-1][1:]))
+
+    if from_read_model:
+        cached = response_cache.put_body(key, json_array(row[0] for row in rows), headers)
+    else:
+        cached = response_cache.put(key, [_recipe_to_dict(row[0], selected_fields) for row in rows], headers)
+    return response_cache.respond(request, cached)
 
-        recipe_data = recipe.model_dump()
-        recipe_data['average_rating'] = avg_rating
-        recipe_data['ingredients'] = response_ingredients
-        
-        response_recipes.append(RecipeResponse(**recipe_data))
-        
-    return response_recipes
+@app.get("/api/recipes/match", response_model=List[RecipeMatchResponse])
+def match_recipes_to_pantry(
+    limit: int = Query(20, ge=1, le=100),
+    min_coverage: float = Query(0.0, ge=0, le=1),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Recipes ranked by how much of them the user's pantry covers (see recipe_matching.py)."""
+    pantry_ids = session.exec(
+        select(UserPantryLink.ingredient_id).where(UserPantryLink.user_id == current_user.id)
+    ).all()
+    matches = recipe_match_index.match(session, pantry_ids, limit=limit, min_coverage=min_coverage)
+    if not matches:
+        return []
+
+    recipes = {
+        recipe.id: recipe for recipe in session.exec(
+            select(Recipe)
+            .where(Recipe.id.in_([match.recipe_id for match in matches]))
+            .options(load_only(Recipe.id, Recipe.title, Recipe.description, Recipe.tags, Recipe.average_rating))
+        ).all()
+    }
+    missing_ids = {ingredient_id for match in matches for ingredient_id in match.missing_ingredient_ids}
+    names = dict(session.exec(
+        select(Ingredient.id, Ingredient.name).where(Ingredient.id.in_(missing_ids))
+    ).all()) if missing_ids else {}
+
+    return [
+        RecipeMatchResponse(
+            id=recipe.id,
+            title=recipe.title,
+            description=recipe.description,
+            tags=recipe.tags,
+            average_rating=round(recipe.average_rating, 1),
+            coverage=round(match.coverage, 3),
+            missing_ingredients=[names[i] for i in match.missing_ingredient_ids if i in names],
+        )
+        for match in matches
+        if (recipe := recipes.get(match.recipe_id)) is not None
+    ]
+
+@app.get("/api/recipes/by-cost", response_model=List[RecipeCostResponse])
+def get_recipes_by_cost(
+    store: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session)
+):
+    """
+    Cheapest recipes first, costed at the latest prices (at store, or wherever each ingredient
+    is cheapest). Recipes with no priced ingredients are left out.
+    """
+    page = price_book.recipe_costs(session, store, offset=offset, limit=limit)
+    if not page:
+        return []
+    recipes = {
+        recipe.id: recipe for recipe in session.exec(
+            select(Recipe)
+            .where(Recipe.id.in_([cost.recipe_id for cost in page]))
+            .options(load_only(Recipe.id, Recipe.title, Recipe.description, Recipe.tags, Recipe.average_rating))
+        ).all()
+    }
+    return [
+        RecipeCostResponse(
+            id=recipe.id,
+            title=recipe.title,
+            description=recipe.description,
+            tags=recipe.tags,
+            average_rating=round(recipe.average_rating, 1),
+            cost_cents=cost.cost_cents,
+            priced_ingredients=cost.priced_ingredients,
+            total_ingredients=cost.total_ingredients,
+        )
+        for cost in page
+        if (recipe := recipes.get(cost.recipe_id)) is not None
+    ]
 
 @app.post("/api/recipes", response_model=RecipeResponse)
 def create_recipe(recipe_data: RecipeCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
     """Creates and saves a single new recipe, and links it to the current user."""
     try:
-        new_recipe = _save_recipe_to_db(recipe_data, session)
-        
-        user = session.exec(
-            select(User).where(User.id == current_user.id).options(selectinload(User.saved_recipes))
-        ).first()
-        
-        user.saved_recipes.append(new_recipe)
-        session.add(user)
+        recipe_id = _save_recipe_to_db(recipe_data, session).id
+        _save_recipes_for_user(session, current_user.id, [recipe_id])
         session.commit()
-        
-        # Eager load the new recipe's links for the response
-        session.refresh(new_recipe, attribute_names=["links"])
-        
-        response_ingredients = [
-            IngredientInRecipe(ingredient_id=link.ingredient.id, name=link.ingredient.name, quantity=link.quantity)
-            for link in new_recipe.links
-        ]
-        
-        recipe_data = new_recipe.model_dump()
-        recipe_data['average_rating'] = 0 # New recipe has 0 rating
-        recipe_data['ingredients'] = response_ingredients
 
-        return RecipeResponse(**recipe_data)
+        return Response(content=session.get(RecipeReadModel, recipe_id).body, media_type="application/json")
 
     except Exception as e:
         session.rollback()
@@ -511,36 +1211,14 @@ def rate_recipe(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    recipe = session.get(Recipe, recipe_id)
-    if not recipe:
+    if not record_rating(session, current_user.id, recipe_id, rating.rating):
         raise HTTPException(status_code=404, detail="Recipe not found")
-
-    existing_rating_link = session.exec(
-        select(UserRecipeRatingLink).where(
-            UserRecipeRatingLink.user_id == current_user.id,
-            UserRecipeRatingLink.recipe_id == recipe_id
-        )
-    ).first()
-
-    if existing_rating_link:
-        recipe.total_rating -= existing_rating_link.rating
-        existing_rating_link.rating = rating.rating
-        recipe.total_rating += rating.rating
-        session.add(existing_rating_link)
-    else:
-        recipe.total_rating += rating.rating
-        recipe.rating_count += 1
-        new_rating_link = UserRecipeRatingLink(user_id=current_user.id, recipe_id=recipe_id, rating=rating.rating)
-        session.add(new_rating_link)
-
-    session.add(recipe)
-    session.commit()
-    session.refresh(recipe)
+    response_cache.bump("recipes")
     return {"message": "Recipe rated successfully"}
 
 
 @app.post("/api/recipes/modify", response_model=RecipeCreate)
-def modify_recipe_endpoint(request: RecipeModificationRequest, session: Session = Depends(get_session)):
+async def modify_recipe_endpoint(request: RecipeModificationRequest, bypass_cache: bool = Query(False)):
     """
     Receives an original recipe and a modification prompt,
     and returns a new, AI-modified recipe.
@@ -549,9 +1227,10 @@ def modify_recipe_endpoint(request: RecipeModificationRequest, session: Session
     try:
         original_recipe_dict = request.original_recipe.model_dump()
         
-        modified_recipe_data = modify_recipe_with_ai(
+        modified_recipe_data = await modify_recipe_with_ai(
             original_recipe=original_recipe_dict,
-            modification_prompt=request.modification_prompt
+            modification_prompt=request.modification_prompt,
+            use_cache=not bypass_cache
         )
 
         if "error" in modified_recipe_data:
@@ -569,8 +1248,13 @@ def modify_recipe_endpoint(request: RecipeModificationRequest, session: Session
 def delete_recipe(recipe_id: int, session: Session = Depends(get_session)):
     recipe = session.get(Recipe, recipe_id)
     if not recipe: raise HTTPException(status_code=404, detail="Recipe not found")
+    # Clear rows keyed on the recipe first, as delete_all_recipes does
+    for link_model in (UserRecipeRatingLink, UserRecipeLink, RecipeIngredientLink, RecipeTag, RecipeReadModel):
+        session.exec(delete(link_model).where(link_model.recipe_id == recipe_id))
     session.delete(recipe)
     session.commit()
+    recipe_match_index.remove_recipes([recipe_id])
+    response_cache.bump("recipes")
     return {"message": "Recipe deleted successfully."}
 
 @app.delete("/api/recipes")
@@ -580,9 +1264,13 @@ def delete_all_recipes(session: Session = Depends(get_session)):
     session.exec(delete(UserRecipeRatingLink))
     session.exec(delete(UserRecipeLink))
     session.exec(delete(RecipeIngredientLink))
+    session.exec(delete(RecipeTag))
+    session.exec(delete(RecipeReadModel))
     
     # Now delete all recipes
     session.exec(delete(Recipe))
     
     session.commit()
+    recipe_match_index.clear()
+    response_cache.bump("recipes")
     return {"message": "All recipes have been cleared."}
\ No newline at end of file
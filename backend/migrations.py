@@ -0,0 +1,181 @@
+# backend/migrations.py
+
+"""
+Schema migrations for existing databases.
+
+SQLModel's create_all only creates missing tables, so columns and indexes added to existing
+tables (and any backfills they need) are applied here. Each migration runs once, in order,
+in its own transaction, and is recorded in the schema_migrations table. Migrations must also
+be safe on a fresh database where create_all has already built the latest schema.
+"""
+
+import json
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from models import normalize_ingredient_name, normalize_tag
+from pricing import parse_price
+from price_rollups import refresh_rollups, refresh_rollups_between
+from recipe_read_model import refresh_recipe_read_models
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+def _add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    if not _has_column(conn, table, column):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _merge_ingredient_into(conn: Connection, duplicate_id: int, canonical_id: int) -> None:
+    """Points every reference at canonical_id and deletes the duplicate ingredient."""
+    params = {"dup": duplicate_id, "canon": canonical_id}
+    conn.execute(text("UPDATE pricehistory SET ingredient_id = :canon WHERE ingredient_id = :dup"), params)
+    # Link tables are keyed on (owner, ingredient): drop rows that would collide, then repoint the rest
+    for table, owner in (("recipeingredientlink", "recipe_id"), ("userpantrylink", "user_id")):
+        conn.execute(text(
+            f"DELETE FROM {table} WHERE ingredient_id = :dup AND {owner} IN "
+            f"(SELECT {owner} FROM {table} WHERE ingredient_id = :canon)"
+        ), params)
+        conn.execute(text(f"UPDATE {table} SET ingredient_id = :canon WHERE ingredient_id = :dup"), params)
+    conn.execute(text("DELETE FROM ingredient WHERE id = :dup"), params)
+
+def _ingredient_name_normalized(conn: Connection) -> None:
+    _add_column(conn, "ingredient", "name_normalized", "VARCHAR")
+
+    rows = conn.execute(text("SELECT id, name FROM ingredient ORDER BY id")).all()
+    canonical: Dict[str, int] = {}
+    updates = []
+    for ingredient_id, name in rows:
+        key = normalize_ingredient_name(name)
+        if key in canonical:
+            _merge_ingredient_into(conn, ingredient_id, canonical[key])
+        else:
+            canonical[key] = ingredient_id
+            updates.append({"id": ingredient_id, "key": key})
+    if updates:
+        conn.execute(text("UPDATE ingredient SET name_normalized = :key WHERE id = :id"), updates)
+
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_ingredient_name_normalized ON ingredient (name_normalized)"
+    ))
+
+def _recipe_tags(conn: Connection) -> None:
+    # create_all has made the recipetag table; fill it from the JSON tags on each recipe
+    rows = []
+    for recipe_id, tags in conn.execute(text("SELECT id, tags FROM recipe")):
+        if isinstance(tags, str):
+            tags = json.loads(tags)
+        seen = set()
+        for tag in tags or []:
+            key = normalize_tag(tag)
+            if key and key not in seen:
+                seen.add(key)
+                rows.append({"recipe_id": recipe_id, "key": key, "tag": tag.strip()})
+    if rows:
+        conn.execute(text(
+            "INSERT INTO recipetag (recipe_id, tag_normalized, tag) VALUES (:recipe_id, :key, :tag) "
+            "ON CONFLICT DO NOTHING"
+        ), rows)
+
+def _recipe_average_rating(conn: Connection) -> None:
+    _add_column(conn, "recipe", "average_rating", "FLOAT NOT NULL DEFAULT 0")
+    conn.execute(text(
+        "UPDATE recipe SET average_rating = CASE WHEN rating_count > 0 "
+        "THEN CAST(total_rating AS REAL) / rating_count ELSE 0 END"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_recipe_average_rating_id ON recipe (average_rating, id)"
+    ))
+
+def _rating_link_recipe_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_userreciperatinglink_recipe_id ON userreciperatinglink (recipe_id)"
+    ))
+
+def _price_history_parsed_prices(conn: Connection) -> None:
+    _add_column(conn, "pricehistory", "price_cents", "INTEGER")
+    _add_column(conn, "pricehistory", "unit_price_cents", "INTEGER")
+    _add_column(conn, "pricehistory", "unit", "VARCHAR")
+    updates = [
+        {"id": price_id, **parse_price(price)._asdict()}
+        for price_id, price in conn.execute(text("SELECT id, price FROM pricehistory WHERE price_cents IS NULL"))
+    ]
+    if updates:
+        conn.execute(text(
+            "UPDATE pricehistory SET price_cents = :price_cents, unit_price_cents = :unit_price_cents, "
+            "unit = :unit WHERE id = :id"
+        ), updates)
+
+def _price_history_ingredient_date_index(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_pricehistory_ingredient_id_date_recorded "
+        "ON pricehistory (ingredient_id, date_recorded)"
+    ))
+
+def _price_rollups(conn: Connection) -> None:
+    # create_all has made the pricerollup table; roll up the history recorded so far
+    last = conn.execute(text("SELECT MAX(date_recorded) FROM pricehistory")).scalar()
+    if last is not None:
+        if isinstance(last, str):
+            last = date.fromisoformat(last)
+        refresh_rollups_between(conn, None, last + timedelta(days=1))
+
+def _price_history_unique_day(conn: Connection) -> None:
+    # Of several prices for one ingredient, store and day, keep the last recorded
+    duplicates = conn.execute(text(
+        "SELECT ingredient_id, store, date_recorded FROM pricehistory "
+        "GROUP BY ingredient_id, store, date_recorded HAVING COUNT(*) > 1"
+    )).all()
+    if duplicates:
+        conn.execute(text(
+            "DELETE FROM pricehistory WHERE id NOT IN "
+            "(SELECT MAX(id) FROM pricehistory GROUP BY ingredient_id, store, date_recorded)"
+        ))
+        refresh_rollups(conn, [
+            (ingredient_id, store, day if isinstance(day, date) else date.fromisoformat(day))
+            for ingredient_id, store, day in duplicates
+        ])
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_pricehistory_ingredient_id_store_date_recorded "
+        "ON pricehistory (ingredient_id, store, date_recorded)"
+    ))
+
+def _recipe_read_model(conn: Connection) -> None:
+    # create_all has made the recipereadmodel table; fill it for the recipes saved so far
+    recipe_ids = [recipe_id for recipe_id, in conn.execute(text("SELECT id FROM recipe"))]
+    refresh_recipe_read_models(conn, recipe_ids)
+
+
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_ingredient_name_normalized", _ingredient_name_normalized),
+    ("0002_recipe_tags", _recipe_tags),
+    ("0003_recipe_average_rating", _recipe_average_rating),
+    ("0004_rating_link_recipe_index", _rating_link_recipe_index),
+    ("0005_price_history_parsed_prices", _price_history_parsed_prices),
+    ("0006_price_history_ingredient_date_index", _price_history_ingredient_date_index),
+    ("0007_price_rollups", _price_rollups),
+    ("0008_price_history_unique_day", _price_history_unique_day),
+    ("0009_recipe_read_model", _recipe_read_model),
+]
+
+def run_migrations(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR PRIMARY KEY, applied_at VARCHAR NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+
+    for name, migration in MIGRATIONS:
+        if name in applied:
+            continue
+        print(f"Applying migration {name}...")
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :applied_at)"),
+                {"name": name, "applied_at": datetime.now(timezone.utc).isoformat()}
+            )
@@ -1,9 +1,20 @@
 # backend/models.py
 
 from sqlmodel import SQLModel, Field, Relationship, Column, JSON, Float
-from typing import Optional, List, Dict, Any
+from sqlalchemy import event, Index
+from typing import Optional, List, Dict, Any, Iterable, Iterator
 from datetime import datetime, date
 
+# --- Query helpers ---
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+IN_CLAUSE_CHUNK_SIZE = 500
+
+def chunked(items: Iterable, size: int = IN_CLAUSE_CHUNK_SIZE) -> Iterator[List]:
+    """The distinct items, in first-seen order, in lists of at most size (one per IN (...) query)."""
+    unique = list(dict.fromkeys(items))
+    for i in range(0, len(unique), size):
+        yield unique[i:i + size]
+
 # --- User Recipe Link (Many-to-Many for Saved Recipes) ---
 class UserRecipeLink(SQLModel, table=True):
     user_id: Optional[int] = Field(
@@ -28,7 +39,7 @@ class UserRecipeRatingLink(SQLModel, table=True):
         default=None, foreign_key="user.id", primary_key=True
     )
     recipe_id: Optional[int] = Field(
-        default=None, foreign_key="recipe.id", primary_key=True
+        default=None, foreign_key="recipe.id", primary_key=True, index=True # For per-recipe totals
     )
     rating: float = Field(default=0, ge=1, le=5)
     
@@ -67,6 +78,11 @@ class User(SQLModel, table=True):
 
 
 class Recipe(SQLModel, table=True):
+    __table_args__ = (
+        # Rating filters and sorts range-scan this; id breaks ties for keyset pagination
+        Index("ix_recipe_average_rating_id", "average_rating", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: str
@@ -76,15 +92,49 @@ class Recipe(SQLModel, table=True):
     # Rating Caching
     total_rating: int = Field(default=0)
     rating_count: int = Field(default=0)
+    average_rating: float = Field(default=0) # total_rating / rating_count, kept up to date by rate_recipe
 
     links: List[RecipeIngredientLink] = Relationship(back_populates="recipe")
     saved_by_users: List[User] = Relationship(back_populates="saved_recipes", link_model=UserRecipeLink)
     ratings: List[UserRecipeRatingLink] = Relationship(back_populates="recipe")
 
 
+def normalize_tag(tag: str) -> str:
+    """Matching key for recipe tags: case-insensitive, whitespace collapsed."""
+    return " ".join(tag.split()).casefold()
+
+
+# --- Recipe Tag (one row per tag, so tag filters and counts can use an index) ---
+class RecipeTag(SQLModel, table=True):
+    __table_args__ = (
+        # Covers /api/tags: counts per tag and a display name without touching the table
+        Index("ix_recipetag_tag_normalized_tag", "tag_normalized", "tag"),
+    )
+
+    recipe_id: Optional[int] = Field(
+        default=None, foreign_key="recipe.id", primary_key=True
+    )
+    tag_normalized: str = Field(primary_key=True)
+    tag: str # As first written on the recipe
+
+
+# --- Recipe Read Model (each recipe's response JSON, see recipe_read_model.py) ---
+class RecipeReadModel(SQLModel, table=True):
+    recipe_id: Optional[int] = Field(
+        default=None, foreign_key="recipe.id", primary_key=True
+    )
+    body: str # The recipe as a serialized RecipeResponse
+
+
+def normalize_ingredient_name(name: str) -> str:
+    """Lookup key for ingredient names: casefolded with whitespace collapsed."""
+    return " ".join(name.split()).casefold()
+
+
 class Ingredient(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
+    name_normalized: Optional[str] = Field(default=None, unique=True, index=True) # Kept in sync with name
     category: Optional[str] = Field(default=None, index=True)
     is_staple: bool = Field(default=False) # To identify common pantry staples
 
@@ -93,11 +143,42 @@ class Ingredient(SQLModel, table=True):
     users_with_in_pantry: List[User] = Relationship(back_populates="pantry_items", link_model=UserPantryLink)
 
 
+@event.listens_for(Ingredient, "before_insert")
+@event.listens_for(Ingredient, "before_update")
+def _set_ingredient_name_normalized(mapper, connection, target):
+    target.name_normalized = normalize_ingredient_name(target.name)
+
+
 class PriceHistory(SQLModel, table=True):
+    __table_args__ = (
+        # Price history is read per ingredient over a date range
+        Index("ix_pricehistory_ingredient_id_date_recorded", "ingredient_id", "date_recorded"),
+        # One price per ingredient, store and day; ingest upserts on it
+        Index("ux_pricehistory_ingredient_id_store_date_recorded", "ingredient_id", "store", "date_recorded", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     ingredient_id: int = Field(foreign_key="ingredient.id")
     date_recorded: date = Field(default_factory=date.today, index=True)
     price: str 
+    # Parsed from price when it is recorded (see pricing.parse_price); None where unreadable
+    price_cents: Optional[int] = None
+    unit_price_cents: Optional[int] = None # Per kg, per l or each, as given by unit
+    unit: Optional[str] = None
     store: str = Field(index=True)
 
-    ingredient: Ingredient = Relationship(back_populates="price_history")
\ No newline at end of file
+    ingredient: Ingredient = Relationship(back_populates="price_history")
+
+
+# --- Price Rollup (weekly/monthly aggregates of price history, see price_rollups.py) ---
+class PriceRollup(SQLModel, table=True):
+    ingredient_id: int = Field(foreign_key="ingredient.id", primary_key=True)
+    resolution: str = Field(primary_key=True) # "week" or "month"
+    store: str = Field(primary_key=True)
+    period_start: date = Field(primary_key=True)
+    min_cents: int
+    max_cents: int
+    sum_cents: int # With count, so the average can be recomputed exactly
+    count: int
+    last_cents: int
+    last_date: date
\ No newline at end of file
@@ -0,0 +1,166 @@
+# backend/price_rollups.py
+
+"""
+Weekly and monthly price aggregates (min/avg/max/last per ingredient and store), kept in the
+pricerollup table so long-range charts read a few hundred rows instead of the raw history.
+
+Writes to price history recompute the rollup buckets they touch, from the raw rows, in the
+same transaction. Weeks start on Monday but are cut at month boundaries, so every week lies
+inside one month and a month start is a boundary at both resolutions.
+
+With PRICE_HISTORY_RETENTION_DAYS set, raw rows older than that (counted back to the start of
+their month) are compacted every PRICE_HISTORY_COMPACT_INTERVAL seconds: their buckets are
+recomputed one last time and the raw rows deleted. Because the cutoff is a month start, a
+bucket is either compacted whole or not at all. The API only records prices for today; a row
+written some other way into a month that has already been compacted would replace that
+month's rollups rather than be merged into them.
+"""
+
+import asyncio
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert
+from sqlmodel import Session, select, func
+
+from models import PriceHistory, PriceRollup, chunked
+
+PRICE_HISTORY_RETENTION_DAYS = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "0")) # 0 keeps raw rows forever
+PRICE_HISTORY_COMPACT_INTERVAL = float(os.getenv("PRICE_HISTORY_COMPACT_INTERVAL", "86400"))
+
+RESOLUTIONS = ("week", "month")
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+def period_bounds(resolution: str, day: date) -> Tuple[date, date]:
+    """[start, end) of the bucket holding day."""
+    month_start, month_end = day.replace(day=1), _next_month(day)
+    if resolution == "month":
+        return month_start, month_end
+    monday = day - timedelta(days=day.weekday())
+    return max(monday, month_start), min(monday + timedelta(days=7), month_end)
+
+
+def _refresh_month(db, month_start: date, ingredient_ids: Optional[Set[int]] = None,
+                   stores: Optional[Set[str]] = None) -> None:
+    """
+    Recomputes the month and week buckets of one month from its raw rows, for every
+    ingredient_ids x stores pair (None meaning all of them). db is a Session or Connection.
+    """
+    month_end = _next_month(month_start)
+    in_month = [
+        PriceHistory.date_recorded >= month_start,
+        PriceHistory.date_recorded < month_end,
+        PriceHistory.price_cents.is_not(None),
+    ]
+    # Stores are filtered here rather than in SQL: given a store condition, SQLite scans the
+    # store index instead of seeking on ingredient and date
+    ids_chunks = [None] if ingredient_ids is None else list(chunked(sorted(ingredient_ids)))
+    for ids in ids_chunks:
+        conditions = in_month if ids is None else [PriceHistory.ingredient_id.in_(ids), *in_month]
+        rows = db.execute(
+            select(PriceHistory.ingredient_id, PriceHistory.store, PriceHistory.date_recorded,
+                   PriceHistory.id, PriceHistory.price_cents)
+            .where(*conditions)
+        )
+
+        # (ingredient id, resolution, store, period start) -> [min, max, sum, count, (last date, last id), last price]
+        buckets: Dict[Tuple[int, str, str, date], list] = {}
+        periods: Dict[date, Tuple[Tuple[str, date], ...]] = {} # day -> (resolution, period start) of its buckets
+        for ingredient_id, store, day, row_id, cents in rows:
+            if stores is not None and store not in stores:
+                continue
+            if day not in periods:
+                periods[day] = tuple((resolution, period_bounds(resolution, day)[0]) for resolution in RESOLUTIONS)
+            for resolution, period_start in periods[day]:
+                key = (ingredient_id, resolution, store, period_start)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [cents, cents, cents, 1, (day, row_id), cents]
+                    continue
+                if cents < bucket[0]:
+                    bucket[0] = cents
+                if cents > bucket[1]:
+                    bucket[1] = cents
+                bucket[2] += cents
+                bucket[3] += 1
+                if (day, row_id) > bucket[4]:
+                    bucket[4], bucket[5] = (day, row_id), cents
+
+        # Replaced rather than upserted, so buckets whose rows were all deleted go too
+        stale = [PriceRollup.period_start >= month_start, PriceRollup.period_start < month_end]
+        if ids is not None:
+            stale.append(PriceRollup.ingredient_id.in_(ids))
+        if stores is not None:
+            stale.append(PriceRollup.store.in_(stores))
+        db.execute(delete(PriceRollup).where(*stale))
+        values = [
+            {
+                "ingredient_id": ingredient_id, "resolution": resolution, "store": store, "period_start": period_start,
+                "min_cents": low, "max_cents": high, "sum_cents": total, "count": count,
+                "last_cents": last_cents, "last_date": last[0],
+            }
+            for (ingredient_id, resolution, store, period_start), (low, high, total, count, last, last_cents)
+            in buckets.items()
+        ]
+        if values:
+            db.execute(insert(PriceRollup), values)
+
+def refresh_rollups(db, touched: Iterable[Tuple[int, str, date]]) -> None:
+    """
+    Recomputes the buckets holding each (ingredient id, store, date) written to price history,
+    a month at a time. Runs in the caller's transaction; the caller commits.
+    """
+    months: Dict[date, Tuple[Set[int], Set[str]]] = {}
+    for ingredient_id, store, day in touched:
+        ingredient_ids, stores = months.setdefault(day.replace(day=1), (set(), set()))
+        ingredient_ids.add(ingredient_id)
+        stores.add(store)
+    for month_start, (ingredient_ids, stores) in sorted(months.items()):
+        _refresh_month(db, month_start, ingredient_ids, stores)
+
+def refresh_rollups_between(db, start: Optional[date], end: date) -> None:
+    """Recomputes every bucket in the months holding [start, end); start None means the oldest row."""
+    if start is None:
+        start = db.execute(select(func.min(PriceHistory.date_recorded))).scalar()
+        if start is None:
+            return
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+    month_start = start.replace(day=1)
+    while month_start < end:
+        _refresh_month(db, month_start)
+        month_start = _next_month(month_start)
+
+
+# --- Retention ---
+def compaction_cutoff(today: date, retention_days: int = PRICE_HISTORY_RETENTION_DAYS) -> date:
+    """Raw rows dated before this are compacted: the start of the month retention_days ago."""
+    return (today - timedelta(days=retention_days)).replace(day=1)
+
+def compact_price_history(bind, retention_days: int = PRICE_HISTORY_RETENTION_DAYS,
+                          today: Optional[date] = None) -> int:
+    """Folds raw rows past the retention window into their rollups and deletes them; returns how many."""
+    if retention_days <= 0:
+        return 0
+    cutoff = compaction_cutoff(today or date.today(), retention_days)
+    with Session(bind) as session:
+        refresh_rollups_between(session, None, cutoff)
+        result = session.execute(delete(PriceHistory).where(PriceHistory.date_recorded < cutoff))
+        session.commit()
+    if result.rowcount:
+        print(f"Compacted {result.rowcount} price history rows recorded before {cutoff}.")
+    return result.rowcount
+
+async def run_compaction(bind) -> None:
+    """Compacts on startup and then every PRICE_HISTORY_COMPACT_INTERVAL seconds, until cancelled."""
+    while True:
+        try:
+            await run_in_threadpool(compact_price_history, bind)
+        except Exception as e:
+            print(f"Could not compact price history: {e}")
+        await asyncio.sleep(PRICE_HISTORY_COMPACT_INTERVAL)
@@ -0,0 +1,249 @@
+# backend/pricing.py
+
+"""
+Numeric prices and basket costing.
+
+Stores report prices as text like "$11.00 ($2.20 per 100g)". parse_price turns that into the
+price_cents / unit_price_cents / unit columns once, when a price is recorded; unit prices are
+normalised to per kg, per l or each where the unit allows.
+
+PriceBook keeps the latest price of every ingredient at every store in memory, for
+POST /api/basket/price and for costing the whole catalog (GET /api/recipes/by-cost). A basket
+buys one of each ingredient at its shelf price: recipe quantities are free text, so they
+aren't scaled. Prices recorded through the API update the book in place; it is also rebuilt
+in the background after PRICE_BOOK_MAX_AGE seconds (to pick up other processes' writes) or
+when prices are deleted.
+"""
+
+import os
+import re
+import time
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlmodel import Session, select, func
+
+from cache import RefreshingIndex
+from models import PriceHistory
+from recipe_matching import recipe_match_index
+
+PRICE_BOOK_MAX_AGE = float(os.getenv("PRICE_BOOK_MAX_AGE", "300"))
+
+
+# --- Parsing ---
+class ParsedPrice(NamedTuple):
+    price_cents: Optional[int]
+    unit_price_cents: Optional[int]
+    unit: Optional[str]
+
+_AMOUNT = r"\$\s*(\d[\d,]*(?:\.\d+)?)"
+_PRICE_RE = re.compile(_AMOUNT)
+_UNIT_PRICE_RE = re.compile(_AMOUNT + r"\s*(?:per\s*(\d*\.?\d+)?\s*([a-z]+)|(each))", re.IGNORECASE)
+# Unit -> (unit prices are normalised to, how many of the unit make one of it)
+_UNITS = {
+    "g": ("kg", 1000), "kg": ("kg", 1),
+    "ml": ("l", 1000), "l": ("l", 1),
+    "ea": ("each", 1), "each": ("each", 1),
+}
+
+def _cents(amount: str, scale: Decimal = Decimal(1)) -> int:
+    return int((Decimal(amount.replace(",", "")) * 100 * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def parse_price(text: Optional[str]) -> ParsedPrice:
+    """
+    "$4.00 ($2.00 per 1kg)" -> (400, 200, "kg"). The first amount is the shelf price; the unit
+    price is whichever amount is followed by "per <quantity><unit>" or "each". Parts that
+    can't be read are None.
+    """
+    match = _PRICE_RE.search(text or "")
+    if not match:
+        return ParsedPrice(None, None, None)
+    price_cents = _cents(match.group(1))
+
+    unit_match = _UNIT_PRICE_RE.search(text, match.start())
+    if not unit_match:
+        return ParsedPrice(price_cents, None, None)
+    amount, quantity, unit, each = unit_match.groups()
+    if each:
+        return ParsedPrice(price_cents, _cents(amount), "each")
+    unit, per_unit = _UNITS.get(unit.lower(), (unit.lower(), 1))
+    quantity = Decimal(quantity) if quantity else Decimal(1)
+    if not quantity:
+        return ParsedPrice(price_cents, None, None)
+    return ParsedPrice(price_cents, _cents(amount, per_unit / quantity), unit)
+
+
+# --- Latest prices ---
+class StorePrice(NamedTuple):
+    store: str
+    price_cents: int
+    unit_price_cents: Optional[int]
+    unit: Optional[str]
+    date_recorded: date
+
+class StoreTotal(NamedTuple):
+    store: str
+    total_cents: int
+    missing_ingredient_ids: List[int]
+
+class BasketQuote(NamedTuple):
+    stores: List[StoreTotal] # Most complete first, then cheapest
+    cheapest: Dict[int, StorePrice] # Ingredient id -> where it is cheapest
+    unpriced_ingredient_ids: List[int]
+
+class RecipeCost(NamedTuple):
+    recipe_id: int
+    cost_cents: int
+    priced_ingredients: int
+    total_ingredients: int
+
+
+_POSITION_BITS = 40
+_POSITION_MASK = (1 << _POSITION_BITS) - 1
+
+
+class PriceBook(RefreshingIndex):
+    description = "price book"
+
+    def __init__(self, max_age: float = PRICE_BOOK_MAX_AGE):
+        super().__init__(max_age)
+        self._latest: Dict[int, Dict[str, StorePrice]] = {} # ingredient id -> store -> price
+        # Prices recorded while a build is reading the database, replayed onto its result
+        self._changes_during_build: Optional[List[Tuple[int, StorePrice]]] = None
+        # Bumped on every change; catalog costs are cached against it
+        self.version = 0
+        self._recipe_costs: Dict[Optional[str], tuple] = {} # store -> (versions, totals, ranking)
+
+    @staticmethod
+    def _put(latest: Dict[int, Dict[str, StorePrice]], ingredient_id: int, price: StorePrice) -> None:
+        current = latest.setdefault(ingredient_id, {}).get(price.store)
+        if current is None or price.date_recorded >= current.date_recorded:
+            latest[ingredient_id][price.store] = price
+
+    def _build(self, session: Session) -> None:
+        with self._lock:
+            self._changes_during_build = []
+        # The newest price per ingredient and store; of several on the same day, the last recorded
+        ranked = (
+            select(
+                PriceHistory.ingredient_id, PriceHistory.store, PriceHistory.price_cents,
+                PriceHistory.unit_price_cents, PriceHistory.unit, PriceHistory.date_recorded,
+                func.row_number().over(
+                    partition_by=(PriceHistory.ingredient_id, PriceHistory.store),
+                    order_by=(PriceHistory.date_recorded.desc(), PriceHistory.id.desc())
+                ).label("rank")
+            )
+            .where(PriceHistory.price_cents.is_not(None))
+            .subquery()
+        )
+        rows = session.exec(
+            select(
+                ranked.c.ingredient_id, ranked.c.store, ranked.c.price_cents,
+                ranked.c.unit_price_cents, ranked.c.unit, ranked.c.date_recorded
+            ).where(ranked.c.rank == 1)
+        )
+        latest: Dict[int, Dict[str, StorePrice]] = {}
+        for ingredient_id, store, price_cents, unit_price_cents, unit, date_recorded in rows:
+            self._put(latest, ingredient_id, StorePrice(store, price_cents, unit_price_cents, unit, date_recorded))
+
+        with self._lock:
+            for ingredient_id, price in self._changes_during_build:
+                self._put(latest, ingredient_id, price)
+            self._changes_during_build = None
+            self._latest = latest
+            self.version += 1
+            self._built_at = time.monotonic()
+
+    def record(self, prices: Iterable[Tuple[int, str, date, ParsedPrice]]) -> None:
+        """(ingredient id, store, date recorded, parsed price) for newly recorded prices."""
+        if self._built_at is None and self._changes_during_build is None:
+            return # Not built yet; the first build will read them from the database
+        with self._lock:
+            for ingredient_id, store, date_recorded, parsed in prices:
+                if parsed.price_cents is None:
+                    continue
+                price = StorePrice(store, parsed.price_cents, parsed.unit_price_cents, parsed.unit, date_recorded)
+                self._put(self._latest, ingredient_id, price)
+                if self._changes_during_build is not None:
+                    self._changes_during_build.append((ingredient_id, price))
+            self.version += 1
+
+    def quote(self, session: Session, ingredient_ids: Iterable[int]) -> BasketQuote:
+        """Per-store totals for buying one of each ingredient, and the cheapest store for each."""
+        self._ensure_fresh(session)
+        latest = self._latest
+        ingredient_ids = list(dict.fromkeys(ingredient_ids))
+
+        totals: Dict[str, int] = {}
+        stocked: Dict[str, set] = {}
+        cheapest: Dict[int, StorePrice] = {}
+        for ingredient_id in ingredient_ids:
+            prices = latest.get(ingredient_id)
+            if not prices:
+                continue
+            # Copied: a concurrent record() may add a store to this dict
+            for price in list(prices.values()):
+                totals[price.store] = totals.get(price.store, 0) + price.price_cents
+                stocked.setdefault(price.store, set()).add(ingredient_id)
+                best = cheapest.get(ingredient_id)
+                if best is None or (price.price_cents, price.store) < (best.price_cents, best.store):
+                    cheapest[ingredient_id] = price
+
+        stores = [
+            StoreTotal(store, total, [i for i in ingredient_ids if i not in stocked[store]])
+            for store, total in totals.items()
+        ]
+        stores.sort(key=lambda s: (len(s.missing_ingredient_ids), s.total_cents, s.store))
+        return BasketQuote(stores, cheapest, [i for i in ingredient_ids if i not in cheapest])
+
+    def recipe_costs(self, session: Session, store: Optional[str] = None, offset: int = 0,
+                     limit: Optional[int] = None) -> List[RecipeCost]:
+        """
+        Recipes with at least one priced ingredient, cheapest first (ties oldest first), costed
+        at the cheapest store for each ingredient or only at store. The ranking of the whole
+        catalog is cached until prices or recipes change.
+        """
+        self._ensure_fresh(session)
+        version = self.version
+        cached = self._recipe_costs.get(store)
+        if cached is None or cached[0] != (version, recipe_match_index.version):
+            cents: Dict[int, int] = {}
+            for ingredient_id, prices in list(self._latest.items()):
+                if store is not None:
+                    price = prices.get(store)
+                    if price is not None:
+                        cents[ingredient_id] = price.price_cents
+                elif prices:
+                    cents[ingredient_id] = min(price.price_cents for price in list(prices.values()))
+
+            totals = recipe_match_index.ingredient_totals(session, cents)
+            # Sorting plain ints (cost above index position) is several times faster than tuples
+            ranking = [
+                cost << _POSITION_BITS | position
+                for position, cost in enumerate(totals.sums)
+                if totals.counts[position] and totals.recipe_ids[position] is not None
+            ]
+            ranking.sort()
+            cached = self._recipe_costs[store] = ((version, totals.version), totals, ranking)
+
+        _, totals, ranking = cached
+        page = ranking[offset:] if limit is None else ranking[offset:offset + limit]
+        costs = []
+        for key in page:
+            position = key & _POSITION_MASK
+            costs.append(RecipeCost(
+                totals.recipe_ids[position], key >> _POSITION_BITS,
+                totals.counts[position], len(totals.ingredients[position])
+            ))
+        return costs
+
+    def stats(self) -> dict:
+        return {
+            "ingredients": len(self._latest),
+            "prices": sum(len(prices) for prices in self._latest.values()),
+            "version": self.version,
+        }
+
+
+price_book = PriceBook()
@@ -0,0 +1,160 @@
+# backend/product_parser.py
+
+"""
+Pluggable extraction of Coles product tiles from a rendered specials page.
+
+Every backend returns the same list of {name, price, store, category} dicts:
+- "bs4":      full BeautifulSoup tree with the pure-Python html.parser (reference implementation)
+- "strainer": BeautifulSoup limited to product-tile sections with a SoupStrainer
+- "lxml":     lxml.html tree queried with compiled XPath (fastest, needs lxml installed)
+
+Run `python product_parser.py [page.html]` to check the backends agree and benchmark them
+on a saved page (tests/fixtures/product_tiles.html by default; tests/test_product_parser.py
+checks the same agreement).
+"""
+
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import UnicodeDammit
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+STORE_NAME = "Coles"
+TILE_ATTRS = {'data-testid': 'product-tile'}
+
+ParserFn = Callable[[bytes, str], List[Dict]]
+
+
+def _build_record(name: str, price: str, unit_price: Optional[str], category_name: str) -> Optional[Dict]:
+    if not price:
+        return None
+    full_price_string = price
+    if unit_price is not None:
+        full_price_string = f"{price} ({unit_price.split('|')[0].strip()})"
+    return {
+        "name": name,
+        "price": full_price_string,
+        "store": STORE_NAME,
+        "category": category_name
+    }
+
+def _parse_soup_tiles(products, category_name: str) -> List[Dict]:
+    parsed = []
+    for product in products:
+        name_tag = product.find('h2', class_='product__title')
+        price_tag = product.find('span', class_='price__value')
+        unit_price_tag = product.find('div', class_='price__calculation_method')
+
+        if name_tag and price_tag:
+            record = _build_record(
+                name_tag.get_text(strip=True),
+                price_tag.get_text(strip=True),
+                unit_price_tag.get_text(strip=True) if unit_price_tag else None,
+                category_name
+            )
+            if record:
+                parsed.append(record)
+    return parsed
+
+def parse_with_html_parser(html: bytes, category_name: str) -> List[Dict]:
+    """Reference backend: the original full-tree BeautifulSoup parse."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return _parse_soup_tiles(soup.find_all('section', attrs=TILE_ATTRS), category_name)
+
+def parse_with_strainer(html: bytes, category_name: str) -> List[Dict]:
+    """Only builds tree nodes inside product-tile sections."""
+    strainer = SoupStrainer('section', attrs=TILE_ATTRS)
+    soup = BeautifulSoup(html, 'lxml' if lxml else 'html.parser', parse_only=strainer)
+    return _parse_soup_tiles(soup.find_all('section', attrs=TILE_ATTRS), category_name)
+
+
+def _class_xpath(tag: str, class_name: str) -> str:
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+if lxml:
+    _TILES_XPATH = etree.XPath("//section[@data-testid='product-tile']")
+    _NAME_XPATH = etree.XPath(_class_xpath('h2', 'product__title'))
+    _PRICE_XPATH = etree.XPath(_class_xpath('span', 'price__value'))
+    _UNIT_PRICE_XPATH = etree.XPath(_class_xpath('div', 'price__calculation_method'))
+    _TEXT_XPATH = etree.XPath(".//text()")
+
+def _lxml_text(element) -> str:
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return "".join(piece.strip() for piece in _TEXT_XPATH(element))
+
+def parse_with_lxml(html: bytes, category_name: str) -> List[Dict]:
+    """Parses with libxml2 and walks the tiles with precompiled XPath expressions."""
+    if not html or not html.strip():
+        return []
+    # libxml2 reads bytes without a <meta charset> as Latin-1, so detect the encoding the
+    # same way BeautifulSoup does and tell the parser
+    encoding = UnicodeDammit(html, is_html=True).original_encoding if isinstance(html, bytes) else None
+    root = lxml.html.fromstring(html, parser=lxml.html.HTMLParser(encoding=encoding))
+    parsed = []
+    for product in _TILES_XPATH(root):
+        name_tags = _NAME_XPATH(product)
+        price_tags = _PRICE_XPATH(product)
+        if not name_tags or not price_tags:
+            continue
+        unit_price_tags = _UNIT_PRICE_XPATH(product)
+        record = _build_record(
+            _lxml_text(name_tags[0]),
+            _lxml_text(price_tags[0]),
+            _lxml_text(unit_price_tags[0]) if unit_price_tags else None,
+            category_name
+        )
+        if record:
+            parsed.append(record)
+    return parsed
+
+
+PARSERS: Dict[str, ParserFn] = {
+    "bs4": parse_with_html_parser,
+    "strainer": parse_with_strainer,
+}
+if lxml:
+    PARSERS["lxml"] = parse_with_lxml
+
+def get_parser(name: Optional[str] = None) -> ParserFn:
+    """
+    Returns the named backend, or the one set in SCRAPER_PARSER, or the fastest available.
+    """
+    name = name or os.getenv("SCRAPER_PARSER")
+    if name is None:
+        return PARSERS["lxml"] if "lxml" in PARSERS else PARSERS["strainer"]
+    if name not in PARSERS:
+        raise ValueError(f"Unknown or unavailable parser '{name}'. Available: {', '.join(PARSERS)}")
+    return PARSERS[name]
+
+
+def benchmark(html: bytes, repeat: int = 50, category_name: str = "Meat & Seafood") -> bool:
+    """Checks every backend matches the reference output and prints per-parse timings."""
+    reference = parse_with_html_parser(html, category_name)
+    print(f"Reference parser found {len(reference)} products.")
+    all_equal = True
+    for name, parser in PARSERS.items():
+        result = parser(html, category_name)
+        matches = result == reference
+        all_equal = all_equal and matches
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parser(html, category_name)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+        print(f"{name:>9}: {elapsed_ms:8.3f} ms/page  {'matches reference' if matches else 'MISMATCH'}")
+    return all_equal
+
+
+if __name__ == "__main__":
+    fixture = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "tests", "fixtures", "product_tiles.html")
+    with open(fixture, "rb") as f:
+        page = f.read()
+    sys.exit(0 if benchmark(page) else 1)
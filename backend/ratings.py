@@ -0,0 +1,159 @@
+# backend/ratings.py
+
+"""
+Rating writes for POST /api/recipes/{id}/rate.
+
+Each user's rating is one upserted UserRecipeRatingLink row; the recipe keeps running totals
+(total_rating, rating_count, average_rating) for filtering and sorting. By default the totals
+are updated in the same transaction with an UPDATE relative to the stored values, after the
+recipe row is locked, so concurrent ratings never overwrite each other.
+
+With RATING_WRITE_BEHIND on, a rating only upserts the user's row and marks the recipe dirty;
+every RATING_FLUSH_INTERVAL seconds the totals of all dirty recipes are recomputed from the
+rating rows in one statement. A popular recipe then costs one recipe-row write per interval
+instead of one per rating, and because the totals are recomputed rather than incremented, a
+missed or repeated flush can only delay them, never make them wrong.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update, case, cast, literal, Float
+from sqlmodel import Session, select, func
+
+from database import dialect_insert
+from models import Recipe, UserRecipeRatingLink
+from recipe_read_model import refresh_recipe_read_models
+from response_cache import response_cache
+
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND", "").strip().lower() in ("1", "true", "yes", "on")
+RATING_FLUSH_INTERVAL = float(os.getenv("RATING_FLUSH_INTERVAL", "2"))
+
+
+def _upsert_rating_link(session: Session, user_id: int, recipe_id: int, rating: float) -> bool:
+    """Inserts or replaces the user's rating in one statement; False if the recipe doesn't exist."""
+    insert_stmt = dialect_insert(session, UserRecipeRatingLink).from_select(
+        ["user_id", "recipe_id", "rating"],
+        # Selecting from recipe means nothing is written for a missing recipe
+        select(literal(user_id), Recipe.id, literal(rating)).where(Recipe.id == recipe_id)
+    )
+    result = session.execute(insert_stmt.on_conflict_do_update(
+        index_elements=["user_id", "recipe_id"],
+        set_={"rating": insert_stmt.excluded.rating}
+    ))
+    return result.rowcount > 0
+
+
+def _apply_rating_to_totals(session: Session, user_id: int, recipe_id: int, rating: float) -> bool:
+    """
+    Adds the rating to the recipe's totals, relative to the user's previous rating. Must run
+    before the link upsert. False if the recipe doesn't exist.
+    """
+    # Lock the recipe row before reading the previous rating. Otherwise, on Postgres (READ
+    # COMMITTED), two first ratings by the same user could both read no previous rating and
+    # count it twice. Waiting on the lock means the next statement sees the other rating.
+    # SQLite has no FOR UPDATE and doesn't need it: writers there are serialized already.
+    locked = session.execute(select(Recipe.id).where(Recipe.id == recipe_id).with_for_update()).first()
+    if locked is None:
+        return False
+
+    previous = (
+        select(UserRecipeRatingLink.rating)
+        .where(UserRecipeRatingLink.user_id == user_id, UserRecipeRatingLink.recipe_id == recipe_id)
+        .scalar_subquery()
+    )
+    new_total = Recipe.total_rating + rating - func.coalesce(previous, 0)
+    new_count = Recipe.rating_count + case((previous.is_(None), 1), else_=0)
+    result = session.execute(
+        update(Recipe)
+        .where(Recipe.id == recipe_id)
+        .values(total_rating=new_total, rating_count=new_count, average_rating=cast(new_total, Float) / new_count)
+    )
+    return result.rowcount > 0
+
+
+class RatingAggregator:
+    """Recipes with ratings not yet reflected in their totals, and the flush that updates them."""
+
+    def __init__(self, interval: float = RATING_FLUSH_INTERVAL):
+        self.interval = interval
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.recipes_flushed = 0
+
+    def mark(self, recipe_id: int) -> None:
+        with self._lock:
+            self._dirty.add(recipe_id)
+
+    def flush(self, bind) -> int:
+        with self._lock:
+            recipe_ids, self._dirty = self._dirty, set()
+        if not recipe_ids:
+            return 0
+
+        of_recipe = UserRecipeRatingLink.recipe_id == Recipe.id
+        total = select(func.coalesce(func.sum(UserRecipeRatingLink.rating), 0)).where(of_recipe).scalar_subquery()
+        count = select(func.count(UserRecipeRatingLink.user_id)).where(of_recipe).scalar_subquery()
+        try:
+            with Session(bind) as session:
+                session.execute(
+                    update(Recipe)
+                    .where(Recipe.id.in_(recipe_ids))
+                    .values(
+                        total_rating=total,
+                        rating_count=count,
+                        average_rating=func.coalesce(cast(total, Float) / func.nullif(count, 0), 0)
+                    )
+                )
+                refresh_recipe_read_models(session, recipe_ids)
+                session.commit()
+        except Exception:
+            # Put them back so the next flush retries
+            with self._lock:
+                self._dirty |= recipe_ids
+            raise
+        response_cache.bump("recipes")
+        self.flushes += 1
+        self.recipes_flushed += len(recipe_ids)
+        return len(recipe_ids)
+
+    async def run(self, bind) -> None:
+        """Flushes every interval until cancelled, then once more."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    await run_in_threadpool(self.flush, bind)
+                except Exception as e:
+                    print(f"Could not flush rating totals: {e}")
+        finally:
+            await run_in_threadpool(self.flush, bind)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._dirty), "flushes": self.flushes, "recipes_flushed": self.recipes_flushed}
+
+
+rating_aggregator = RatingAggregator()
+
+
+def record_rating(session: Session, user_id: int, recipe_id: int, rating: float) -> bool:
+    """Saves a user's rating of a recipe and commits; False if the recipe doesn't exist."""
+    if RATING_WRITE_BEHIND:
+        if not _upsert_rating_link(session, user_id, recipe_id, rating):
+            session.rollback()
+            return False
+        session.commit()
+        rating_aggregator.mark(recipe_id)
+        return True
+
+    if not _apply_rating_to_totals(session, user_id, recipe_id, rating):
+        session.rollback()
+        return False
+    _upsert_rating_link(session, user_id, recipe_id, rating)
+    refresh_recipe_read_models(session, [recipe_id])
+    session.commit()
+    return True
@@ -0,0 +1,314 @@
+# backend/recipe_matching.py
+
+"""
+In-memory ingredient -> recipe index behind /api/recipes/match ("what can I cook with my pantry").
+
+A recipe's coverage is the weighted share of its ingredients that are in the pantry. Staples
+(salt, oil, flour...) weigh RECIPE_MATCH_STAPLE_WEIGHT of a regular ingredient, so having
+them doesn't make a recipe look cookable and lacking them doesn't rule it out.
+
+Recipes sit at fixed positions, and each ingredient has an incidence bitmask (a Python int
+with a bit set for every recipe using it). Matching adds the pantry's masks up as bit-sliced
+counters, so each step is a handful of big-int operations over the whole catalog. Recipes are
+also grouped by how many regular and staple ingredients they have: within a group, every
+(regular matched, staples matched) pair has a known coverage, so results are read off best
+coverage first and the search stops as soon as the page is full.
+
+Recipes saved or deleted through the API update the index in place; it is also rebuilt in
+the background after RECIPE_MATCH_MAX_AGE seconds (to pick up writes from other processes)
+or when an ingredient's staple flag changes.
+"""
+
+import os
+import time
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlmodel import Session, select
+
+from cache import RefreshingIndex
+from models import Ingredient, RecipeIngredientLink
+
+RECIPE_MATCH_MAX_AGE = float(os.getenv("RECIPE_MATCH_MAX_AGE", "300"))
+RECIPE_MATCH_STAPLE_WEIGHT = float(os.getenv("RECIPE_MATCH_STAPLE_WEIGHT", "0.25"))
+
+
+class RecipeMatch(NamedTuple):
+    recipe_id: int
+    coverage: float
+    missing_ingredient_ids: Tuple[int, ...]
+
+class IngredientTotals(NamedTuple):
+    """Per position: the recipe (None if deleted), its ingredients, and the sum and count of its valued ones."""
+    version: int
+    recipe_ids: List[Optional[int]]
+    ingredients: List[Tuple[int, ...]]
+    sums: List[int]
+    counts: List[int]
+
+
+def _bitmask(positions: Iterable[int], width: int) -> int:
+    bits = bytearray((width + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+def _add_to_counts(planes: List[int], mask: int) -> None:
+    """Adds one at every position in mask to counts kept bit-sliced (planes[k] is bit k of each count)."""
+    carry = mask
+    for k, plane in enumerate(planes):
+        if not carry:
+            return
+        planes[k], carry = plane ^ carry, plane & carry
+    if carry:
+        planes.append(carry)
+
+def _counts_equal_to(planes: List[int], value: int) -> int:
+    """Mask of the positions whose count is value (-1, i.e. every bit, when there are no planes)."""
+    if value >> len(planes):
+        return 0
+    mask = -1
+    for k, plane in enumerate(planes):
+        mask &= plane if (value >> k) & 1 else ~plane
+    return mask
+
+
+class RecipeMatchIndex(RefreshingIndex):
+    description = "recipe match index"
+
+    def __init__(self, max_age: float = RECIPE_MATCH_MAX_AGE, staple_weight: float = RECIPE_MATCH_STAPLE_WEIGHT):
+        super().__init__(max_age)
+        self.staple_weight = staple_weight
+        self._staples: Set[int] = set()
+        self._reset()
+        # Changes made while a build is reading the database, replayed onto its result
+        self._changes_during_build: Optional[List[tuple]] = None
+        # Bumped on every change, for callers caching results computed from the index
+        self.version = 0
+
+    def _reset(self) -> None:
+        # A deleted recipe keeps its position (with recipe id None) until the next rebuild
+        self._recipe_ids: List[Optional[int]] = []
+        self._ingredients: List[Tuple[int, ...]] = [] # position -> ingredient ids
+        self._positions: Dict[int, int] = {} # recipe id -> position
+        self._postings: Dict[int, List[int]] = {} # ingredient id -> positions
+        self._masks: Dict[int, int] = {} # ingredient id -> incidence bitmask, made on first use
+        # (regular ingredients, staple ingredients) -> mask of the live recipes with those counts
+        self._groups: Dict[Tuple[int, int], int] = {}
+        self._candidates: Optional[List[tuple]] = None
+
+    def _group_of(self, ingredient_ids: Tuple[int, ...]) -> Tuple[int, int]:
+        staples = sum(1 for i in ingredient_ids if i in self._staples)
+        return len(ingredient_ids) - staples, staples
+
+    def _append(self, recipe_id: int, ingredient_ids: Tuple[int, ...]) -> int:
+        position = len(self._recipe_ids)
+        self._recipe_ids.append(recipe_id)
+        self._ingredients.append(ingredient_ids)
+        self._positions[recipe_id] = position
+        for ingredient_id in ingredient_ids:
+            self._postings.setdefault(ingredient_id, []).append(position)
+        return position
+
+    def _mask(self, ingredient_id: int) -> int:
+        mask = self._masks.get(ingredient_id)
+        if mask is None:
+            mask = self._masks[ingredient_id] = _bitmask(self._postings[ingredient_id], len(self._recipe_ids))
+        return mask
+
+    def _build(self, session: Session) -> None:
+        with self._lock:
+            self._changes_during_build = []
+            in_use = list(self._masks)
+        staples = set(session.exec(select(Ingredient.id).where(Ingredient.is_staple == True)).all())
+        by_recipe: Dict[int, List[int]] = {}
+        for recipe_id, ingredient_id in session.exec(
+            select(RecipeIngredientLink.recipe_id, RecipeIngredientLink.ingredient_id)
+            .order_by(RecipeIngredientLink.recipe_id)
+        ):
+            by_recipe.setdefault(recipe_id, []).append(ingredient_id)
+
+        fresh = RecipeMatchIndex(self.max_age, self.staple_weight)
+        fresh._staples = staples
+        group_positions: Dict[Tuple[int, int], List[int]] = {}
+        for recipe_id, ingredient_ids in by_recipe.items():
+            ingredient_ids = tuple(ingredient_ids)
+            position = fresh._append(recipe_id, ingredient_ids)
+            group_positions.setdefault(fresh._group_of(ingredient_ids), []).append(position)
+        width = len(fresh._recipe_ids)
+        fresh._groups = {group: _bitmask(positions, width) for group, positions in group_positions.items()}
+        # Masks that pantries were using are made now rather than on their next request
+        for ingredient_id in in_use:
+            if ingredient_id in fresh._postings:
+                fresh._mask(ingredient_id)
+
+        with self._lock:
+            for change, args in self._changes_during_build:
+                getattr(fresh, change)(*args)
+            self._changes_during_build = None
+            self._staples, self._recipe_ids, self._ingredients = fresh._staples, fresh._recipe_ids, fresh._ingredients
+            self._positions, self._postings, self._masks = fresh._positions, fresh._postings, fresh._masks
+            self._groups, self._candidates = fresh._groups, fresh._candidates
+            self.version += 1
+            self._built_at = time.monotonic()
+
+    # --- Incremental updates from this process's writes ---
+    def add_recipes(self, recipes: Iterable[Tuple[int, Iterable[int]]]) -> None:
+        """(recipe id, ingredient ids) for newly saved recipes."""
+        if self._built_at is None and self._changes_during_build is None:
+            return # Not built yet; the first build will read them from the database
+        with self._lock:
+            for recipe_id, ingredient_ids in recipes:
+                self._replace(recipe_id, tuple(dict.fromkeys(ingredient_ids)))
+            self.version += 1
+
+    def remove_recipes(self, recipe_ids: Iterable[int]) -> None:
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+            self.version += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+            self.version += 1
+
+    def _record(self, change: str, *args) -> None:
+        if self._changes_during_build is not None:
+            self._changes_during_build.append((change, args))
+
+    def _replace(self, recipe_id: int, ingredient_ids: Tuple[int, ...]) -> None:
+        self._record("_replace", recipe_id, ingredient_ids)
+        self._unlink(recipe_id)
+        bit = 1 << self._append(recipe_id, ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            if ingredient_id in self._masks:
+                self._masks[ingredient_id] |= bit
+        group = self._group_of(ingredient_ids)
+        if group not in self._groups:
+            self._candidates = None
+        self._groups[group] = self._groups.get(group, 0) | bit
+
+    def _unlink(self, recipe_id: int) -> None:
+        position = self._positions.pop(recipe_id, None)
+        if position is not None:
+            self._recipe_ids[position] = None
+            self._groups[self._group_of(self._ingredients[position])] &= ~(1 << position)
+
+    def _remove(self, recipe_id: int) -> None:
+        self._record("_remove", recipe_id)
+        self._unlink(recipe_id)
+
+    def _clear(self) -> None:
+        self._record("_clear")
+        self._reset()
+
+    def _ranked_candidates(self) -> List[tuple]:
+        """(-coverage, missing, group..., regular matched, staples matched) for every group, best first."""
+        if self._candidates is None:
+            weight = self.staple_weight
+            candidates = []
+            for of_regular, of_staples in self._groups:
+                total = of_regular + weight * of_staples
+                for regular in range(of_regular + 1):
+                    for staples in range(of_staples + 1):
+                        if regular or staples:
+                            candidates.append((
+                                -(regular + weight * staples) / total,
+                                of_regular + of_staples - regular - staples,
+                                of_regular, of_staples, regular, staples,
+                            ))
+            candidates.sort()
+            self._candidates = candidates
+        return self._candidates
+
+    def match(self, session: Session, pantry_ids: Iterable[int], limit: int = 20,
+              min_coverage: float = 0.0) -> List[RecipeMatch]:
+        """Best-covered recipes first; ties go to recipes missing fewer ingredients, then newer ones."""
+        self._ensure_fresh(session)
+
+        with self._lock:
+            pantry = set(pantry_ids)
+            regular_counts: List[int] = []
+            staple_counts: List[int] = []
+            regular_owned = staples_owned = 0
+            for ingredient_id in pantry:
+                if ingredient_id not in self._postings:
+                    continue
+                if ingredient_id in self._staples:
+                    _add_to_counts(staple_counts, self._mask(ingredient_id))
+                    staples_owned += 1
+                else:
+                    _add_to_counts(regular_counts, self._mask(ingredient_id))
+                    regular_owned += 1
+
+            regular_equal: Dict[int, int] = {}
+            staples_equal: Dict[int, int] = {}
+            found: List[Tuple[int, float]] = []
+            # Candidates with the same coverage and missing count are merged, so ties across
+            # groups still come out newest first
+            for (neg_coverage, _), candidates in groupby(self._ranked_candidates(), key=itemgetter(0, 1)):
+                if len(found) >= limit or -neg_coverage < min_coverage:
+                    break
+                tied = 0
+                for _, _, of_regular, of_staples, regular, staples in candidates:
+                    if regular > regular_owned or staples > staples_owned:
+                        continue
+                    hits = self._groups.get((of_regular, of_staples))
+                    if not hits:
+                        continue
+                    if regular not in regular_equal:
+                        regular_equal[regular] = _counts_equal_to(regular_counts, regular)
+                    hits &= regular_equal[regular]
+                    if not hits:
+                        continue
+                    if staples not in staples_equal:
+                        staples_equal[staples] = _counts_equal_to(staple_counts, staples)
+                    tied |= hits & staples_equal[staples]
+                # Highest positions first, as later positions hold more recently saved recipes
+                while tied and len(found) < limit:
+                    position = tied.bit_length() - 1
+                    tied ^= 1 << position
+                    found.append((position, -neg_coverage))
+
+            return [
+                RecipeMatch(
+                    recipe_id=self._recipe_ids[position],
+                    coverage=coverage,
+                    missing_ingredient_ids=tuple(i for i in self._ingredients[position] if i not in pantry),
+                )
+                for position, coverage in found
+            ]
+
+    def ingredient_totals(self, session: Session, values: Dict[int, int]) -> IngredientTotals:
+        """Sums values over every recipe's ingredients, in one pass over the postings of values."""
+        self._ensure_fresh(session)
+
+        with self._lock:
+            sums = [0] * len(self._recipe_ids)
+            counts = [0] * len(self._recipe_ids)
+            for ingredient_id, value in values.items():
+                for position in self._postings.get(ingredient_id, ()):
+                    sums[position] += value
+                    counts[position] += 1
+            return IngredientTotals(self.version, list(self._recipe_ids), list(self._ingredients), sums, counts)
+
+    def stats(self) -> dict:
+        live = len(self._positions)
+        return {
+            "recipes": live,
+            "ingredients": len(self._postings),
+            "dead_slots": len(self._recipe_ids) - live,
+            "cached_masks": len(self._masks),
+        }
+
+
+recipe_match_index = RecipeMatchIndex()
+
+@event.listens_for(Ingredient, "after_update")
+def _invalidate_recipe_match(mapper, connection, target):
+    # Staple flags feed the weights, so rebuild (in the background) rather than patch
+    if inspect(target).attrs.is_staple.history.has_changes():
+        recipe_match_index.invalidate()
@@ -0,0 +1,69 @@
+# backend/recipe_read_model.py
+
+"""
+Each recipe's finished response JSON (RecipeResponse, with its ingredients), kept in the
+recipereadmodel table.
+
+Listing full recipes used to load every recipe's links and ingredients into the ORM and build
+and validate a RecipeResponse for each. With the read model a page is one indexed read of
+ready-made JSON, joined into the response body without being decoded. Every write that changes
+what a recipe's response shows (saving it, rating it, flushing write-behind rating totals)
+calls refresh_recipe_read_models inside that write's transaction, so once committed the two agree.
+"""
+
+import json
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, insert
+from sqlmodel import select
+
+from models import Ingredient, Recipe, RecipeIngredientLink, RecipeReadModel, chunked
+
+
+def refresh_recipe_read_models(db, recipe_ids: Iterable[int]) -> None:
+    """
+    Rewrites the read model of each recipe from its current rows; ids of recipes that no longer
+    exist just lose theirs. db is a Session or Connection; the caller commits.
+    """
+    for chunk in chunked(sorted(set(recipe_ids))):
+        ingredients: Dict[int, List[dict]] = {recipe_id: [] for recipe_id in chunk}
+        for recipe_id, name, quantity, ingredient_id in db.execute(
+            select(RecipeIngredientLink.recipe_id, Ingredient.name, RecipeIngredientLink.quantity, Ingredient.id)
+            .join(Ingredient, Ingredient.id == RecipeIngredientLink.ingredient_id)
+            .where(RecipeIngredientLink.recipe_id.in_(chunk))
+            .order_by(RecipeIngredientLink.recipe_id, RecipeIngredientLink.ingredient_id)
+        ):
+            ingredients[recipe_id].append({"name": name, "quantity": quantity, "ingredient_id": ingredient_id})
+
+        rows = []
+        for recipe_id, title, description, instructions, tags, total_rating, rating_count, average_rating in db.execute(
+            select(
+                Recipe.id, Recipe.title, Recipe.description, Recipe.instructions, Recipe.tags,
+                Recipe.total_rating, Recipe.rating_count, Recipe.average_rating
+            ).where(Recipe.id.in_(chunk))
+        ):
+            # Same fields, order and encoding as a serialized RecipeResponse
+            body = {
+                "id": recipe_id,
+                "title": title,
+                "description": description,
+                "instructions": instructions,
+                "ingredients": ingredients[recipe_id],
+                "tags": tags or [],
+                "total_rating": total_rating,
+                "rating_count": rating_count,
+                "average_rating": round(average_rating, 1),
+            }
+            rows.append({
+                "recipe_id": recipe_id,
+                "body": json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")),
+            })
+
+        db.execute(delete(RecipeReadModel).where(RecipeReadModel.recipe_id.in_(chunk)))
+        if rows:
+            db.execute(insert(RecipeReadModel), rows)
+
+
+def json_array(bodies: Iterable[str]) -> bytes:
+    """Pre-encoded JSON values joined into one JSON array."""
+    return ("[" + ",".join(bodies) + "]").encode("utf-8")
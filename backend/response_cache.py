@@ -0,0 +1,159 @@
+# backend/response_cache.py
+
+"""
+Cached JSON responses for read-mostly endpoints (staples, tags, today's prices, recipe pages).
+
+Each endpoint's cache key is its path and query string plus the versions of the resources it
+reads ("recipes", "prices", "ingredients"). Writes bump those versions after they commit, so a
+changed resource is simply looked up under a new key and the stale bodies age out of the LRU.
+Versions are per process: with several workers a write is only seen by the one that handled
+it, so entries also expire after RESPONSE_CACHE_TTL seconds.
+
+A cached body is serialized once; its strong ETag is a hash of those bytes, so it is the same
+on every worker. If-None-Match is answered with 304 straight from the cache. Bodies of at
+least RESPONSE_COMPRESS_MIN_BYTES are served gzip- or brotli-encoded (brotli when installed),
+compressed once per cached body.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+# Cache-Control policies: clients keep the body but check its ETag before each reuse, except for
+# the staple list, which only the seed script changes
+REVALIDATE = "no-cache"
+STATIC = "public, max-age=3600"
+
+# Most preferred first
+_ENCODINGS = (("br", lambda body: brotli.compress(body, quality=5)),) if brotli is not None else ()
+_ENCODINGS += (("gzip", lambda body: gzip.compress(body, compresslevel=6, mtime=0)),)
+
+
+class CachedBody:
+    """A serialized response body with its ETag, extra headers and compressed forms."""
+
+    def __init__(self, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.body = body
+        self.headers = headers or {}
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str, compress) -> bytes:
+        # Two requests may both compress it the first time; either result is kept
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body)
+        return self._encoded[encoding]
+
+
+class ResourceVersions:
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *resources: str) -> None:
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, 0) + 1
+
+    def get(self, resources: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(resource, 0) for resource in resources)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison; encoded variants carry a -<encoding> suffix."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-")[0] == etag:
+            return True
+    return False
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> set:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.versions = ResourceVersions()
+        self._bodies = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.not_modified = 0
+
+    def bump(self, *resources: str) -> None:
+        """Call after committing a write to these resources."""
+        self.versions.bump(*resources)
+
+    def key(self, request: Request, resources: Tuple[str, ...], *extra: Hashable) -> tuple:
+        query = tuple(sorted(request.query_params.multi_items()))
+        return (request.url.path, query, resources, self.versions.get(resources), *extra)
+
+    def get(self, key: tuple) -> Optional[CachedBody]:
+        return self._bodies.get(key)
+
+    def put(self, key: tuple, content: Any, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        """Serializes content the way JSONResponse does and caches it under key."""
+        body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        return self.put_body(key, body, headers)
+
+    def put_body(self, key: tuple, body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        """Caches an already serialized JSON body under key."""
+        cached = CachedBody(body, headers)
+        self._bodies.set(key, cached)
+        return cached
+
+    def respond(self, request: Request, cached: CachedBody, cache_control: str = REVALIDATE) -> Response:
+        headers = {**cached.headers, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        body, etag = cached.body, cached.etag
+        if len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+            accepted = _accepted_encodings(request.headers.get("accept-encoding"))
+            for encoding, compress in _ENCODINGS:
+                if encoding in accepted or "*" in accepted:
+                    body, etag = cached.encoded(encoding, compress), f"{cached.etag}-{encoding}"
+                    headers["Content-Encoding"] = encoding
+                    break
+        headers["ETag"] = f'"{etag}"'
+
+        if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+            self.not_modified += 1
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._bodies.stats(), "not_modified": self.not_modified}
+
+
+response_cache = ResponseCache()
@@ -48,17 +48,13 @@ class RecipeResponse(SQLModel):
     tags: List[str]
     total_rating: int
     rating_count: int
+    average_rating: float = 0
 
     @classmethod
     def from_orm(cls, recipe, **kwargs):
-        # Calculate average_rating
-        avg = 0
-        if recipe.rating_count > 0:
-            avg = round(recipe.total_rating / recipe.rating_count, 1)
-        
         # Merge calculated fields with model fields
         data = recipe.model_dump()
-        data['average_rating'] = avg
+        data['average_rating'] = round(recipe.average_rating, 1)
         
         # Allow overriding with kwargs
         data.update(kwargs)
@@ -73,15 +69,52 @@ class RecipeResponse(SQLModel):
             ingredients=data['ingredients'],
             tags=data['tags'],
             total_rating=data['total_rating'],
-            rating_count=data['rating_count']
+            rating_count=data['rating_count'],
+            average_rating=data['average_rating']
         )
 
+class RecipeMatchResponse(SQLModel):
+    id: int
+    title: str
+    description: str
+    tags: List[str]
+    average_rating: float
+    coverage: float # Weighted share of the recipe's ingredients in the pantry, 0-1
+    missing_ingredients: List[str]
+
+class RecipeCostResponse(SQLModel):
+    id: int
+    title: str
+    description: str
+    tags: List[str]
+    average_rating: float
+    cost_cents: int # One of each priced ingredient at its latest price
+    priced_ingredients: int
+    total_ingredients: int
+
+class TagCount(SQLModel):
+    tag: str
+    count: int
+
 class PriceHistoryCreate(SQLModel):
     ingredient_name: str
     price: str
     store: str
     category: Optional[str] = None
 
+class PriceBulkRowResult(SQLModel):
+    index: int
+    status: str # "created", "updated" (price changed), "unchanged" or "invalid"
+    ingredient_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class PriceBulkResponse(SQLModel):
+    created: int
+    updated: int
+    unchanged: int
+    failed: int
+    results: List[PriceBulkRowResult]
+
 class PriceHistoryRead(SQLModel):
     id: int
     ingredient_id: int
@@ -90,6 +123,46 @@ class PriceHistoryRead(SQLModel):
     store: str
     ingredient_name: Optional[str] = None
     category: Optional[str] = None
+    price_cents: Optional[int] = None
+    unit_price_cents: Optional[int] = None
+    unit: Optional[str] = None
+
+class PriceSeries(SQLModel):
+    ingredient_id: int
+    ingredient_name: str
+    store: str
+    resolution: str # "raw", "week" or "month"
+    dates: List[str] # Oldest first; period starts for rollups
+    prices: List[int] # In cents, one per date; period averages for rollups
+    # Rollups only
+    min_prices: Optional[List[int]] = None
+    max_prices: Optional[List[int]] = None
+    last_prices: Optional[List[int]] = None
+
+class BasketPriceRequest(SQLModel):
+    # One of the two
+    ingredient_ids: Optional[List[int]] = None
+    recipe_id: Optional[int] = None
+
+class BasketItemPrice(SQLModel):
+    ingredient_id: int
+    ingredient_name: str
+    store: str
+    price_cents: int
+    unit_price_cents: Optional[int] = None
+    unit: Optional[str] = None
+    date_recorded: str
+
+class StoreBasketTotal(SQLModel):
+    store: str
+    total_cents: int # For the ingredients the store has
+    missing_ingredient_ids: List[int]
+
+class BasketPriceResponse(SQLModel):
+    stores: List[StoreBasketTotal] # Most complete first, then cheapest
+    cheapest_split: List[BasketItemPrice] # Each ingredient from the store where it is cheapest
+    cheapest_split_total_cents: int
+    unpriced_ingredient_ids: List[int]
 
 class GenerateRequest(SQLModel):
     specials: List[PriceHistoryRead]
@@ -108,6 +181,18 @@ class PantryItem(SQLModel):
 class PantryItemCreate(SQLModel):
     ingredient_name: str
 
+class PantryBulkUpdate(SQLModel):
+    add: List[str] = [] # Ingredient names
+    remove: List[int] = [] # Ingredient ids
+
+class SavedRecipesUpdate(SQLModel):
+    add: List[int] = [] # Recipe ids
+    remove: List[int] = []
+
+class BulkUpdateResult(SQLModel):
+    added: int
+    removed: int
+
 class RecipeModificationRequest(SQLModel):
     original_recipe: RecipeCreate # AI-generated, so it follows RecipeCreate schema
     modification_prompt: str
\ No newline at end of file
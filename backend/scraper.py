@@ -2,12 +2,27 @@
 
 import requests
 import os
+import argparse
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
+from product_parser import get_parser, PARSERS
 import time
 
 # --- UPDATED: API URL for prices ---
 API_URL = "http://127.0.0.1:8000/api/prices"
+BULK_CHUNK_SIZE = 500
+SAVE_STATUSES = ("created", "updated", "unchanged")
+SCRAPINGBEE_URL = 'https://app.scrapingbee.com/api/v1/'
+REQUEST_TIMEOUT = 120
+MAX_FETCH_RETRIES = 3
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RPS = 1.0
+# Pages a category may run ahead of the last page known to have products. Every page is a
+# billed ScrapingBee credit, so at most DEFAULT_LOOKAHEAD - 1 are spent past a category's end.
+DEFAULT_LOOKAHEAD = 2
 load_dotenv()
 
 CATEGORY_MAP = {
@@ -21,7 +36,10 @@ CATEGORIES_TO_SCRAPE = [
 ]
 
 def clear_old_prices():
-    """Clears today's price records before starting a new scrape."""
+    """
+    Clears today's price records before starting a new scrape. Only needed to drop products
+    that are no longer on special: ingest already replaces today's price for each product.
+    """
     print("--- Clearing today's price records ---")
     try:
         # --- UPDATED: Endpoint for deleting today's prices ---
@@ -33,118 +51,281 @@ def clear_old_prices():
         print(f"Error clearing price records: {e}")
         return False
 
-def save_price_record(ingredient_name, price, store, category):
-    """Saves a single price record to the database."""
-    payload = {
-        "ingredient_name": ingredient_name,
-        "price": price,
-        "store": store,
-        "category": category
-    }
+def save_price_records_bulk(records):
+    """
+    Saves a list of scraped products through the bulk ingest endpoint.
+    Returns how many records were created, updated (price changed) and left unchanged.
+    """
+    payload = [
+        {
+            "ingredient_name": record["name"],
+            "price": record["price"],
+            "store": record["store"],
+            "category": record["category"]
+        }
+        for record in records
+    ]
     try:
-        response = requests.post(API_URL, json=payload)
+        response = requests.post(f"{API_URL}/bulk", json=payload, timeout=120)
         if response.status_code != 200:
-            print(f"Failed to save '{ingredient_name}': {response.status_code} {response.text}")
-        return response.status_code == 200
+            print(f"Failed to save batch of {len(payload)} records: {response.status_code} {response.text}")
+            return {}
+        result = response.json()
+        for row in result["results"]:
+            if row["status"] == "invalid":
+                print(f"Failed to save '{payload[row['index']]['ingredient_name']}': {row['detail']}")
+        return {status: result[status] for status in SAVE_STATUSES}
     except requests.exceptions.RequestException as e:
-        print(f"Error saving price record: {e}")
-        return False
+        print(f"Error saving price records: {e}")
+        return {}
+
+def _positive_float(value):
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+class RateLimiter:
+    """
+    Thread-safe rate limiter shared by all fetch workers.
+    Spaces requests at least 1/rps apart, and widens that spacing (up to
+    MAX_BACKOFF x) whenever the upstream starts throttling or failing.
+    """
+    MAX_BACKOFF = 32.0
+
+    def __init__(self, rps):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self.backoff = 1.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval * self.backoff
+        if slot > now:
+            time.sleep(slot - now)
+
+    def penalize(self, retry_after=None):
+        with self.lock:
+            self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
+            delay = retry_after if retry_after is not None else self.interval * self.backoff
+            self.next_slot = max(self.next_slot, time.monotonic() + delay)
+
+    def reward(self):
+        with self.lock:
+            self.backoff = max(1.0, self.backoff * 0.75)
+
+
+_thread_local = threading.local()
+
+def _http_session():
+    """One pooled requests.Session per worker thread."""
+    if not hasattr(_thread_local, "session"):
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+def fetch_page(api_key, page_url, limiter):
+    """Fetches one rendered page through ScrapingBee, retrying throttled or failed requests."""
+    params = {
+        'api_key': api_key,
+        'url': page_url,
+        'render_js': 'true',
+        'wait_for': "[data-testid='product-tile']",
+        'country_code': 'au'
+    }
+    for attempt in range(1, MAX_FETCH_RETRIES + 1):
+        limiter.acquire()
+        try:
+            response = _http_session().get(SCRAPINGBEE_URL, params=params, timeout=REQUEST_TIMEOUT)
+        except requests.exceptions.RequestException:
+            if attempt == MAX_FETCH_RETRIES:
+                raise
+            limiter.penalize()
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            if attempt == MAX_FETCH_RETRIES:
+                response.raise_for_status()
+            retry_after = response.headers.get("Retry-After")
+            limiter.penalize(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            time.sleep(random.uniform(0, 1))
+            continue
+
+        response.raise_for_status()
+        limiter.reward()
+        return response.content
+
+class CategoryCursor:
+    """
+    Hands out page numbers for one category. Pages are fetched ahead speculatively, but
+    no more than `lookahead` pages past the last one known to have products;
+    the first empty (or failed) page marks the end of the category.
+    """
+    def __init__(self, base_url, lookahead=DEFAULT_LOOKAHEAD):
+        self.base_url = base_url
+        category_slug = base_url.split('/')[-1]
+        self.category_name = CATEGORY_MAP.get(category_slug, "Other Specials")
+        self.lookahead = lookahead
+        self.next_page = 1
+        self.last_page = None
+        self.last_found_page = 0
 
-def scrape_coles_specials():
+    def has_more(self):
+        """Whether another page can be handed out now (False doesn't mean the category is done)."""
+        if self.last_page is not None and self.next_page > self.last_page:
+            return False
+        return self.next_page <= self.last_found_page + self.lookahead
+
+    def found_products(self, page_num):
+        self.last_found_page = max(self.last_found_page, page_num)
+
+    def take_page(self):
+        page_num = self.next_page
+        self.next_page += 1
+        return page_num
+
+    def stop_at(self, page_num):
+        end = page_num - 1
+        self.last_page = end if self.last_page is None else min(self.last_page, end)
+
+
+def _save_worker(products_queue, totals):
+    """Drains scraped products from the queue and saves them as they arrive."""
+    finished = False
+    while not finished:
+        batch = []
+        item = products_queue.get()
+        while True:
+            if item is None:
+                finished = True
+            else:
+                batch.extend(item)
+            if len(batch) >= BULK_CHUNK_SIZE:
+                break
+            try:
+                item = products_queue.get_nowait()
+            except queue.Empty:
+                break
+
+        for i in range(0, len(batch), BULK_CHUNK_SIZE):
+            chunk = batch[i:i + BULK_CHUNK_SIZE]
+            # One bad batch mustn't stop the saver, or every later page would be dropped
+            try:
+                counts = save_price_records_bulk(chunk)
+            except Exception as e:
+                print(f"Unexpected error saving batch of {len(chunk)} records: {e}")
+                counts = {}
+            if not counts:
+                totals["failed_batches"] += 1
+                totals["failed"] += len(chunk)
+                continue
+            for status, count in counts.items():
+                totals[status] += count
+
+def scrape_coles_specials(concurrency=DEFAULT_CONCURRENCY, rps=DEFAULT_RPS, parser_name=None, lookahead=DEFAULT_LOOKAHEAD):
     """
     Scrapes specified categories from Coles and saves each item as a
     price history record for the current day.
+
+    Pages from every category are fetched by a pool of `concurrency` workers,
+    rate limited to `rps` requests per second, and each page's products are
+    handed to a background saver as soon as that page is parsed. A category only runs
+    `lookahead` pages ahead of its last page with products, which bounds the credits
+    spent on pages past its end.
+    `parser_name` picks a product_parser backend (defaults to the fastest available).
     """
-    print("\n--- Starting targeted category scrape for Coles ---")
-    
+    print(f"\n--- Starting targeted category scrape for Coles (concurrency={concurrency}, rps={rps}) ---")
+
     api_key = os.getenv("SCRAPINGBEE_API_KEY")
     if not api_key:
         print("Error: SCRAPINGBEE_API_KEY not found in .env file.")
         return
 
-    all_products_to_save = []
+    parse_products = get_parser(parser_name)
+    limiter = RateLimiter(rps)
+    cursors = [CategoryCursor(base_url, lookahead) for base_url in CATEGORIES_TO_SCRAPE]
+    products_queue = queue.Queue()
+    totals = {"found": 0, "failed": 0, "failed_batches": 0, **{status: 0 for status in SAVE_STATUSES}}
+    saver = threading.Thread(target=_save_worker, args=(products_queue, totals), daemon=True)
+    saver.start()
 
-    for base_url in CATEGORIES_TO_SCRAPE:
-        page_num = 1
-        category_slug = base_url.split('/')[-1]
-        category_name = CATEGORY_MAP.get(category_slug, "Other Specials")
-        print(f"\n--- Scraping Category: {category_name} ---")
+    def scrape_page(cursor, page_num):
+        page_url = f"{cursor.base_url}?page={page_num}"
+        print(f"Scraping {cursor.category_name} page {page_num}: {page_url}")
+        return parse_products(fetch_page(api_key, page_url, limiter), cursor.category_name)
 
+    in_flight = {}
+    turn = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
         while True:
-            page_url = f"{base_url}?page={page_num}"
-            print(f"Scraping Page {page_num}: {page_url}")
+            # Keep the pool full, rotating between categories that still have pages
+            while len(in_flight) < concurrency:
+                active = [c for c in cursors if c.has_more()]
+                if not active:
+                    break
+                cursor = active[turn % len(active)]
+                turn += 1
+                page_num = cursor.take_page()
+                in_flight[executor.submit(scrape_page, cursor, page_num)] = (cursor, page_num)
 
-            try:
-                response = requests.get(
-                    url='https://app.scrapingbee.com/api/v1/',
-                    params={
-                        'api_key': api_key,
-                        'url': page_url,
-                        'render_js': 'true',
-                        'wait_for': "[data-testid='product-tile']",
-                        'country_code': 'au' 
-                    },
-                    timeout=120
-                )
-                response.raise_for_status()
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                cursor, page_num = in_flight.pop(future)
+                try:
+                    products = future.result()
+                except requests.exceptions.RequestException as e:
+                    print(f"Error fetching {cursor.category_name} page {page_num}: {e}. Stopping this category.")
+                    cursor.stop_at(page_num)
+                    continue
+                except Exception as e:
+                    print(f"An unexpected error occurred on {cursor.category_name} page {page_num}: {e}. Stopping this category.")
+                    cursor.stop_at(page_num)
+                    continue
 
-                soup = BeautifulSoup(response.content, 'html.parser')
-                products = soup.find_all('section', attrs={'data-testid': 'product-tile'})
-                
                 if not products:
-                    print(f"No products found on page {page_num}. Moving to next category.")
-                    break
+                    print(f"No products found on {cursor.category_name} page {page_num}. End of category.")
+                    cursor.stop_at(page_num)
+                    continue
 
-                print(f"Found {len(products)} products on this page.")
-                for product in products:
-                    name_tag = product.find('h2', class_='product__title')
-                    price_tag = product.find('span', class_='price__value')
-                    unit_price_tag = product.find('div', class_='price__calculation_method')
-                    
-                    if name_tag and price_tag:
-                        name = name_tag.get_text(strip=True)
-                        price = price_tag.get_text(strip=True)
-                        
-                        full_price_string = price
-                        if unit_price_tag:
-                            unit_price = unit_price_tag.get_text(strip=True).split('|')[0].strip()
-                            full_price_string = f"{price} ({unit_price})"
-
-                        if price:
-                            all_products_to_save.append({
-                                "name": name,
-                                "price": full_price_string,
-                                "store": "Coles",
-                                "category": category_name
-                            })
-                
-                page_num += 1
-                time.sleep(2)
-
-            except requests.exceptions.RequestException as e:
-                print(f"Error fetching page {page_num}: {e}. Moving to next category.")
-                break
-            except Exception as e:
-                print(f"An unexpected error occurred on page {page_num}: {e}. Moving to next category.")
-                break
+                print(f"Found {len(products)} products on {cursor.category_name} page {page_num}.")
+                cursor.found_products(page_num)
+                totals["found"] += len(products)
+                products_queue.put(products)
+
+    products_queue.put(None)
+    saver.join()
 
-    if not all_products_to_save:
+    if not totals["found"]:
         print("No products were found across any categories.")
         return
 
-    print(f"\n--- All pages scraped. Found a total of {len(all_products_to_save)} products. Processing and saving... ---")
-    total_saved_count = 0
-    for special in all_products_to_save:
-        if save_price_record(
-            ingredient_name=special["name"],
-            price=special["price"],
-            store=special["store"],
-            category=special["category"]
-        ):
-            total_saved_count += 1
-    
-    print(f"\n--- Scraping complete! A total of {total_saved_count} price records were saved. ---")
+    print(
+        f"\n--- Scraping complete! Found {totals['found']} products; price records: {totals['created']} created, "
+        f"{totals['updated']} updated, {totals['unchanged']} unchanged. ---"
+    )
+    if totals["failed"]:
+        print(f"Warning: {totals['failed_batches']} batch(es) failed to save; {totals['failed']} products were not recorded.")
 
 if __name__ == "__main__":
-    if clear_old_prices():
-        scrape_coles_specials()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape Coles specials into the price history.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Number of pages fetched at once (default {DEFAULT_CONCURRENCY}).")
+    parser.add_argument("--rps", type=_positive_float, default=DEFAULT_RPS,
+                        help=f"Maximum ScrapingBee requests per second (default {DEFAULT_RPS}).")
+    parser.add_argument("--lookahead", type=int, default=DEFAULT_LOOKAHEAD,
+                        help=f"Pages a category is fetched ahead of its last page with products (default {DEFAULT_LOOKAHEAD}).")
+    parser.add_argument("--parser", choices=sorted(PARSERS), default=None,
+                        help="Product tile parser backend (default: fastest available).")
+    parser.add_argument("--clear-today", action="store_true",
+                        help="Delete today's price records first, dropping products no longer on special.")
+    args = parser.parse_args()
+
+    if not args.clear_today or clear_old_prices():
+        scrape_coles_specials(
+            concurrency=max(1, args.concurrency), rps=args.rps, parser_name=args.parser, lookahead=max(1, args.lookahead)
+        )
\ No newline at end of file
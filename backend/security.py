@@ -1,17 +1,23 @@
 # backend/security.py
 
 import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
 
-from database import get_session # Import get_session from database.py
+from cache import TTLCache
+from database import engine
 from models import User
 
 load_dotenv()
@@ -23,7 +29,19 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Argon2 cost; the defaults are passlib's. Hashes made with other settings still verify and
+# are rehashed with the current ones on the user's next login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536")) # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -33,27 +51,125 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# --- Password hashing pool ---
+# Argon2 is slow and memory-hard on purpose. Request handlers hand it to a small dedicated pool
+# (argon2-cffi releases the GIL, so threads run it in parallel) instead of FastAPI's shared
+# threadpool, so a burst of logins queues here rather than starving every other endpoint.
+# Past PASSWORD_HASH_MAX_QUEUE waiting jobs, new ones are refused with a 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+class HashingPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-ins at once, please try again shortly.",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+hashing_pool = HashingPool()
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.run(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash or None); a new hash means the stored one used outdated Argon2 settings."""
+    return await hashing_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+# --- Resolving tokens to users ---
+# Decoded tokens (token -> user id) and user snapshots (user id -> column values) are cached
+# briefly, so most authenticated requests touch neither the JWT library nor the database.
+# update_user_me invalidates its snapshot; other workers may serve a snapshot up to
+# AUTH_CACHE_TTL_SECONDS old.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+token_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.invalidate(user_id)
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats(), "hashing": hashing_pool.stats()}
+
+def _load_user(subject: str) -> Optional[User]:
+    with Session(engine) as session:
+        if subject.isdigit():
+            return session.get(User, int(subject))
+        # Tokens issued before `sub` held the user id carry the email
+        return session.exec(select(User).where(User.email == subject)).first()
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    The user a bearer token belongs to. The result is a detached snapshot: read its fields
+    freely, but load the user in your own session to change it.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        subject = str(user_id)
+    else:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = session.exec(select(User).where(User.email == email)).first()
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        if payload.get("sub") is None:
+            raise credentials_exception
+        subject = str(payload["sub"])
+
+    snapshot = user_cache.get(int(subject)) if subject.isdigit() else None
+    if snapshot is None:
+        user = await run_in_threadpool(_load_user, subject)
+        if user is None:
+            raise credentials_exception
+        snapshot = user.model_dump()
+        user_cache.set(user.id, snapshot)
+
+    if user_id is None:
+        # Never cache a token past its own expiry
+        ttl = AUTH_CACHE_TTL_SECONDS
+        if payload.get("exp") is not None:
+            ttl = min(ttl, payload["exp"] - time.time())
+        token_cache.set(token, snapshot["id"], ttl=ttl)
+    # Built without validation: the values came from the database
+    return User.model_construct(**snapshot)
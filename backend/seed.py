@@ -2,11 +2,15 @@
 
 from sqlmodel import Session, select, func
 from database import engine, create_db_and_tables
-from models import Recipe, Ingredient, RecipeIngredientLink, PriceHistory, User
+from models import (
+    Recipe, RecipeReadModel, RecipeTag, Ingredient, RecipeIngredientLink, PriceHistory, PriceRollup, User,
+    UserRecipeLink, UserRecipeRatingLink, UserPantryLink, normalize_ingredient_name
+)
 from security import get_password_hash
+from pricing import parse_price
+from price_rollups import refresh_rollups
 from datetime import date, timedelta
 import random
-import re
 
 STAPLES_DATA = {
     "Oils, Fats & Vinegars": ["Olive Oil", "Vegetable Oil", "Coconut Oil", "Sesame Oil", "Butter", "Margarine", "Apple Cider Vinegar", "Balsamic Vinegar", "Red Wine Vinegar", "White Vinegar"],
@@ -54,21 +58,23 @@ SPECIALS_DATA = [
     {"ingredient_name": "Australian Kent Pumpkin", "price": "$1.29 ($1.29 per 1kg)", "store": "Aldi", "category": "Fruit & Vegetables"},
 ]
 
-def get_simple_price(price_string):
-    if not price_string: return 0
-    match = re.search(r"\$(\d+\.?\d*)", price_string)
-    return float(match.group(1)) if match else 0
-
 def seed_database():
     print("🔄 Clearing and seeding database with test users, staples, and price history...")
     create_db_and_tables()
 
     with Session(engine) as session:
+        # Rows keyed on a recipe or ingredient go first: cleared ids are reused by new rows
+        session.query(UserRecipeRatingLink).delete()
+        session.query(UserRecipeLink).delete()
+        session.query(UserPantryLink).delete()
         session.query(RecipeIngredientLink).delete()
+        session.query(RecipeTag).delete()
         session.query(PriceHistory).delete()
+        session.query(PriceRollup).delete()
+        session.query(RecipeReadModel).delete()
         session.query(Recipe).delete()
         session.query(Ingredient).delete()
-        print("Old price history, recipes, and ingredients cleared.")
+        print("Old price history, recipes, ingredients, and users' saved recipes, ratings and pantries cleared.")
         session.commit()
         
         user_count = session.exec(select(func.count(User.id))).one()
@@ -85,7 +91,7 @@ def seed_database():
         staples_added = 0
         for category, items in STAPLES_DATA.items():
             for item_name in items:
-                existing_staple = session.exec(select(Ingredient).where(func.lower(Ingredient.name) == item_name.lower())).first()
+                existing_staple = session.exec(select(Ingredient).where(Ingredient.name_normalized == normalize_ingredient_name(item_name))).first()
                 if not existing_staple:
                     new_staple = Ingredient(name=item_name, is_staple=True, category=category)
                     session.add(new_staple)
@@ -95,10 +101,11 @@ def seed_database():
 
 
         total_records = 0
+        recorded = []
         for special_data in SPECIALS_DATA:
             ingredient_name = special_data["ingredient_name"]
             
-            existing_ingredient = session.exec(select(Ingredient).where(func.lower(Ingredient.name) == ingredient_name.lower())).first()
+            existing_ingredient = session.exec(select(Ingredient).where(Ingredient.name_normalized == normalize_ingredient_name(ingredient_name))).first()
 
             if existing_ingredient:
                 ingredient = existing_ingredient
@@ -112,12 +119,12 @@ def seed_database():
             session.commit()
             session.refresh(ingredient)
 
-            base_price = get_simple_price(special_data["price"])
+            base_cents = parse_price(special_data["price"]).price_cents or 0
             for i in range(4):
                 record_date = date.today() - timedelta(weeks=i)
-                randomized_price = round(base_price * random.uniform(0.9, 1.1), 2)
+                randomized_cents = round(base_cents * random.uniform(0.9, 1.1))
                 
-                price_string = f"${randomized_price:.2f}"
+                price_string = f"${randomized_cents / 100:.2f}"
                 if "(" in special_data["price"]:
                     unit_part = special_data["price"].split('(')[1]
                     price_string += f" ({unit_part}"
@@ -126,12 +133,16 @@ def seed_database():
                     ingredient_id=ingredient.id,
                     price=price_string,
                     store=special_data["store"],
-                    date_recorded=record_date
+                    date_recorded=record_date,
+                    **parse_price(price_string)._asdict()
                 )
                 session.add(price_record)
+                recorded.append((ingredient.id, special_data["store"], record_date))
                 total_records += 1
         
         print(f"{total_records} new price history records created across 4 weeks.")
+        session.flush()
+        refresh_rollups(session, recorded)
         session.commit()
 
     print("✅ Database seeded successfully!")
@@ -0,0 +1,53 @@
+# backend/tests/conftest.py
+
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Settings are read at import time, so the test database and cheap password hashing are set
+# up before any backend module is imported
+_db_dir = tempfile.mkdtemp(prefix="recipe-app-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.sqlite3')}"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+os.environ.setdefault("ARGON2_MEMORY_COST", "1024")
+os.environ.setdefault("ARGON2_PARALLELISM", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def register_user(client) -> dict:
+    """Registers a new user and returns headers carrying their token."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    client.post("/register", json={"email": email, "password": "password123"}).raise_for_status()
+    token = client.post("/token", data={"username": email, "password": "password123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def auth_headers(client):
+    return register_user(client)
+
+
+def recipe_payload(title: str = "Test Recipe", ingredients=("Onion", "Garlic"), tags=("Quick",)) -> dict:
+    return {
+        "title": title,
+        "description": "A test recipe",
+        "instructions": "Cook it.",
+        "ingredients": [{"name": name, "quantity": "1"} for name in ingredients],
+        "tags": list(tags),
+    }
@@ -0,0 +1,116 @@
+# backend/tests/test_generate_recipes.py
+
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlmodel import Session, select, func
+
+import ai_service
+from database import engine
+from models import Recipe
+
+GENERATED = [
+    {
+        "title": f"Generated Recipe {n}",
+        "description": "From the specials",
+        "instructions": "Cook it.",
+        "ingredients": [{"name": "Chicken Breast", "quantity": "500g"}],
+        "tags": ["Quick"],
+    }
+    for n in range(3)
+]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answers completions with GENERATED and counts the calls."""
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(GENERATED)))])
+
+    async def stream(**kwargs):
+        calls.append(kwargs)
+        text = json.dumps(GENERATED)
+        for i in range(0, len(text), 40):
+            yield text[i:i + 40]
+
+    monkeypatch.setattr(ai_service, "_create_chat_completion", create)
+    monkeypatch.setattr(ai_service, "_stream_chat_completion", stream)
+    return calls
+
+
+def generate_request() -> dict:
+    # A store no other test uses, so every test gets its own cache key
+    return {
+        "specials": [{"id": 1, "ingredient_id": 1, "date_recorded": "2026-01-01", "price": "$11.00",
+                      "store": uuid.uuid4().hex, "ingredient_name": "Chicken Breast"}],
+        "preferences": {"id": 1, "email": "cook@example.com"},
+        "pantry_items": [],
+    }
+
+
+def recipe_count() -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count(Recipe.id))).one()
+
+
+def sse_events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_repeated_generation_does_not_save_recipes_again(client, fake_llm):
+    request = generate_request()
+    before = recipe_count()
+
+    first = client.post("/api/generate-recipes", json=request)
+    assert first.json()["message"] == "Successfully generated and saved 3 new recipes."
+    assert recipe_count() == before + 3
+
+    second = client.post("/api/generate-recipes", json=request)
+    assert second.status_code == 200
+    assert recipe_count() == before + 3
+    assert len(fake_llm) == 1
+
+    # The streamed version replays the same recipes too
+    events = sse_events(client.post("/api/generate-recipes/stream", json=request).text)
+    assert [event for event, _ in events] == ["recipe", "recipe", "recipe", "done"]
+    assert [data["title"] for _, data in events[:3]] == [recipe["title"] for recipe in GENERATED]
+    assert events[-1][1]["saved"] == 0
+    assert recipe_count() == before + 3
+
+
+def test_streamed_generation_saves_once_and_replays_ids(client, fake_llm):
+    request = generate_request()
+    before = recipe_count()
+
+    first = sse_events(client.post("/api/generate-recipes/stream", json=request).text)
+    assert first[-1] == ("done", {"saved": 3, "message": "Successfully generated and saved 3 new recipes."})
+    ids = [data["id"] for event, data in first if event == "recipe"]
+
+    second = sse_events(client.post("/api/generate-recipes/stream", json=request).text)
+    assert [data["id"] for event, data in second if event == "recipe"] == ids
+    assert recipe_count() == before + 3
+
+    # Once they've all been deleted, the same request generates new ones
+    for recipe_id in ids:
+        client.delete(f"/api/recipes/{recipe_id}")
+    client.post("/api/generate-recipes", json=request)
+    assert recipe_count() == before + 3
+
+
+def test_bypass_cache_generates_and_saves_new_recipes(client, fake_llm):
+    request = generate_request()
+    client.post("/api/generate-recipes", json=request)
+    before = recipe_count()
+
+    client.post("/api/generate-recipes", json=request, params={"bypass_cache": "true"})
+    assert recipe_count() == before + 3
+    assert len(fake_llm) == 2
@@ -0,0 +1,29 @@
+# backend/tests/test_ingredient_search.py
+
+from sqlmodel import Session
+
+from database import engine
+from ingredient_search import ingredient_search_index
+from seed import seed_database
+
+
+def search(client, q: str) -> list:
+    # Rebuilt here rather than in the background, so it has the seeded staples
+    with Session(engine) as session:
+        ingredient_search_index.build(session)
+    response = client.get("/api/ingredients/search", params={"q": q})
+    assert response.status_code == 200
+    return [item["name"] for item in response.json()]
+
+
+def test_typo_in_one_word_of_a_multi_word_name(client):
+    seed_database()
+    assert set(search(client, "sugr")) >= {"White Sugar", "Brown Sugar", "Icing Sugar"}
+    assert search(client, "brwn sugar")[0] == "Brown Sugar"
+    assert "Smoked Paprika" in search(client, "papprika")
+
+
+def test_exact_and_prefix_matches_rank_first(client):
+    seed_database()
+    assert search(client, "garlic")[:2] == ["Garlic", "Garlic Powder"]
+    assert search(client, "chick")[:2] == ["Chicken Broth", "Chickpeas"]
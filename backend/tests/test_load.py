@@ -0,0 +1,138 @@
+# backend/tests/test_load.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select, func
+
+from conftest import recipe_payload, register_user
+from database import get_session
+from models import Ingredient, PriceHistory, Recipe, RecipeReadModel, RecipeTag, User, UserPantryLink
+from response_cache import response_cache
+from security import get_current_user
+
+REQUESTS = 400
+CONCURRENCY = 32
+
+
+# --- Sync baseline ---
+# The five read endpoints as they ran before the async change: sync handlers on the blocking
+# Session, run in Starlette's threadpool, issuing the same queries as the async ones.
+sync_app = FastAPI()
+
+@sync_app.get("/api/recipes")
+def sync_recipes(limit: int = 20, session: Session = Depends(get_session)):
+    session.exec(select(func.count()).select_from(Recipe)).one()
+    return [
+        body for body, _ in session.exec(
+            select(RecipeReadModel.body, Recipe.id)
+            .select_from(Recipe)
+            .join(RecipeReadModel, RecipeReadModel.recipe_id == Recipe.id)
+            .order_by(Recipe.id)
+            .limit(limit + 1)
+        ).all()[:limit]
+    ]
+
+@sync_app.get("/api/tags")
+def sync_tags(session: Session = Depends(get_session)):
+    return session.exec(
+        select(func.min(RecipeTag.tag)).group_by(RecipeTag.tag_normalized).order_by(RecipeTag.tag_normalized)
+    ).all()
+
+@sync_app.get("/api/prices/today")
+def sync_todays_prices(session: Session = Depends(get_session)):
+    prices = session.exec(
+        select(PriceHistory)
+        .where(PriceHistory.date_recorded == date.today())
+        .options(selectinload(PriceHistory.ingredient))
+    ).all()
+    return [
+        {"id": p.id, "ingredient_name": p.ingredient.name, "price": p.price, "store": p.store}
+        for p in prices
+    ]
+
+@sync_app.get("/api/ingredient/{ingredient_id}/price-history")
+def sync_price_history(ingredient_id: int, session: Session = Depends(get_session)):
+    ingredient = session.get(Ingredient, ingredient_id)
+    if not ingredient:
+        raise HTTPException(status_code=404, detail="Ingredient not found.")
+    history = session.exec(
+        select(PriceHistory)
+        .where(PriceHistory.ingredient_id == ingredient_id)
+        .order_by(PriceHistory.date_recorded.desc())
+    ).all()
+    return [{"id": h.id, "price": h.price, "store": h.store} for h in history]
+
+@sync_app.get("/api/pantry")
+def sync_pantry(session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+    rows = session.exec(
+        select(Ingredient.id, Ingredient.name, Ingredient.category)
+        .join(UserPantryLink, UserPantryLink.ingredient_id == Ingredient.id)
+        .where(UserPantryLink.user_id == current_user.id)
+    ).all()
+    return [{"ingredient_id": id, "name": name, "category": category} for id, name, category in rows]
+
+
+# --- Load ---
+@pytest.fixture(scope="module")
+def load_requests(client):
+    """One request to each read endpoint, cycled through by the load runs."""
+    headers = register_user(client)
+    for n in range(20):
+        client.post("/api/recipes", json=recipe_payload(title=f"Load {n}"), headers=headers)
+    ingredient_id = client.post(
+        "/api/prices/bulk", json=[{"ingredient_name": "Load Test Beef", "price": "$10.00", "store": "Coles"}]
+    ).json()["results"][0]["ingredient_id"]
+    return [
+        ("/api/recipes", {"limit": 20}, None),
+        ("/api/tags", {}, None),
+        ("/api/prices/today", {}, None),
+        (f"/api/ingredient/{ingredient_id}/price-history", {}, None),
+        ("/api/pantry", {}, headers),
+    ]
+
+def run_load(client, load_requests, before_each=None) -> float:
+    """Sends REQUESTS requests, CONCURRENCY at a time, checks they all succeed and returns requests/second."""
+    def get(n):
+        path, params, headers = load_requests[n % len(load_requests)]
+        if before_each:
+            before_each(n)
+        return client.get(path, params=params, headers=headers).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        statuses = list(pool.map(get, range(REQUESTS)))
+    elapsed = time.perf_counter() - started
+
+    assert statuses == [200] * REQUESTS
+    return REQUESTS / elapsed
+
+
+def test_async_read_endpoints_under_concurrent_load(client, load_requests):
+    """Mixed traffic on the async read endpoints; run with -s to see the throughput."""
+    def bump(n):
+        if n % 10 == 0:
+            response_cache.bump("recipes", "prices") # keep some requests going to the database
+
+    rps = run_load(client, load_requests, bump)
+    print(f"\n{REQUESTS} requests, {CONCURRENCY} concurrent: {rps:.0f} requests/second")
+
+
+def test_async_read_endpoints_against_sync_baseline(client, load_requests, monkeypatch):
+    """
+    The same load on the sync baseline and on the async endpoints, with the response cache
+    off so both go to the database every time. Run with -s to see both throughputs.
+    """
+    monkeypatch.setattr(response_cache, "get", lambda key: None)
+    with TestClient(sync_app) as sync_client:
+        sync_rps = run_load(sync_client, load_requests)
+    async_rps = run_load(client, load_requests)
+    print(
+        f"\n{REQUESTS} uncached requests, {CONCURRENCY} concurrent: "
+        f"sync {sync_rps:.0f} requests/second, async {async_rps:.0f} requests/second"
+    )
@@ -0,0 +1,33 @@
+# backend/tests/test_product_parser.py
+
+import os
+
+import pytest
+
+from product_parser import PARSERS, parse_with_html_parser
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "product_tiles.html")
+CATEGORY = "Meat & Seafood"
+
+
+@pytest.fixture(scope="module")
+def page() -> bytes:
+    # Raw UTF-8 bytes with no <meta charset>, as the scraper gets them from ScrapingBee
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+def test_reference_parser_reads_the_tiles(page):
+    names = [record["name"] for record in parse_with_html_parser(page, CATEGORY)]
+    # The tile without a price and the non-product section are skipped
+    assert names == [
+        "ColesBeefMince | 500g",
+        "Café Crème Brûlée Yoghurt 4 x 100g",
+        "Salt & Pepper Squid – 300g",
+        "CrèmeFraîche200mL",
+    ]
+
+
+@pytest.mark.parametrize("backend", sorted(PARSERS))
+def test_backends_match_the_reference(page, backend):
+    assert PARSERS[backend](page, CATEGORY) == parse_with_html_parser(page, CATEGORY)
@@ -0,0 +1,68 @@
+# backend/tests/test_query_plans.py
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from conftest import recipe_payload
+from database import async_engine, engine
+from response_cache import response_cache
+
+
+@contextmanager
+def captured_queries():
+    """SELECTs the read endpoints run, with their parameters."""
+    queries = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            queries.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield queries
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+
+def query_plans(client, path: str, params: dict) -> list:
+    """The EXPLAIN QUERY PLAN lines of each query behind a request, by query."""
+    response_cache.bump("recipes") # so the request runs its queries
+    with captured_queries() as queries:
+        assert client.get(path, params=params).status_code == 200
+    assert queries
+    with engine.connect() as conn:
+        return [
+            [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            for statement, parameters in queries
+        ]
+
+
+def uses_rating_index(plan: list) -> bool:
+    recipe_steps = [step for step in plan if " recipe " in f"{step} "]
+    return bool(recipe_steps) and all("ix_recipe_average_rating_id" in step for step in recipe_steps)
+
+
+def test_rating_filter_and_sort_range_scan_the_average_rating_index(client, auth_headers):
+    client.post("/api/recipes", json=recipe_payload(), headers=auth_headers)
+    for params in ({"min_rating": 4, "sort_by": "rating_desc"}, {"min_rating": 2, "sort_by": "rating_asc"},
+                   {"sort_by": "rating_desc"}):
+        for plan in query_plans(client, "/api/recipes", params):
+            assert uses_rating_index(plan), plan
+            assert not any("TEMP B-TREE FOR ORDER BY" in step for step in plan), plan
+
+    # Without a rating sort the page is read in id order (stopping once it is full), but the
+    # total still comes from the index
+    count_plan, _ = query_plans(client, "/api/recipes", {"min_rating": 2})
+    assert uses_rating_index(count_plan), count_plan
+
+
+def test_tag_filter_and_tag_counts_use_the_tag_index(client, auth_headers):
+    client.post("/api/recipes", json=recipe_payload(tags=["Quick", "Easy"]), headers=auth_headers)
+    for plan in query_plans(client, "/api/recipes", {"tags": "quick,easy"}):
+        tag_steps = [step for step in plan if "recipetag" in step]
+        assert tag_steps and all("USING INDEX ix_recipetag_tag_normalized_tag (tag_normalized=?)" in step
+                                 for step in tag_steps), plan
+
+    for plan in query_plans(client, "/api/tags/counts", {}):
+        assert any("COVERING INDEX ix_recipetag_tag_normalized_tag" in step for step in plan), plan
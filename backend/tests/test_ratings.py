@@ -0,0 +1,46 @@
+# backend/tests/test_ratings.py
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlmodel import Session
+
+import ratings
+from conftest import recipe_payload, register_user
+from database import engine
+from models import Recipe, RecipeReadModel
+
+RATERS = 24
+
+
+@pytest.mark.parametrize("write_behind", [False, True], ids=["immediate", "write_behind"])
+def test_concurrent_ratings_keep_exact_totals(client, monkeypatch, write_behind):
+    monkeypatch.setattr(ratings, "RATING_WRITE_BEHIND", write_behind)
+    raters = [register_user(client) for _ in range(RATERS)]
+    recipe_id = client.post("/api/recipes", json=recipe_payload(), headers=raters[0]).json()["id"]
+    final_ratings = [1 + n % 5 for n in range(RATERS)]
+
+    def rate(headers, final_rating):
+        # Each rater changes their mind once, so updates race with first ratings
+        for rating in (3, final_rating):
+            response = client.post(f"/api/recipes/{recipe_id}/rate", json={"rating": rating}, headers=headers)
+            assert response.status_code == 200
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        list(pool.map(rate, raters, final_ratings))
+    if write_behind:
+        ratings.rating_aggregator.flush(engine)
+
+    with Session(engine) as session:
+        recipe = session.get(Recipe, recipe_id)
+        assert (recipe.total_rating, recipe.rating_count) == (sum(final_ratings), RATERS)
+        assert recipe.average_rating == pytest.approx(sum(final_ratings) / RATERS)
+        body = json.loads(session.get(RecipeReadModel, recipe_id).body)
+    assert (body["total_rating"], body["rating_count"]) == (sum(final_ratings), RATERS)
+    assert body["average_rating"] == round(sum(final_ratings) / RATERS, 1)
+
+
+def test_rating_a_missing_recipe_is_404(client, auth_headers):
+    response = client.post("/api/recipes/999999999/rate", json={"rating": 4}, headers=auth_headers)
+    assert response.status_code == 404
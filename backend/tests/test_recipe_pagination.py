@@ -0,0 +1,49 @@
+# backend/tests/test_recipe_pagination.py
+
+import base64
+import json
+
+import pytest
+
+from conftest import recipe_payload
+
+
+def encode(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_rating_sort_pages_cover_every_recipe_once(client, auth_headers):
+    for n in range(5):
+        recipe_id = client.post("/api/recipes", json=recipe_payload(title=f"Paged {n}"), headers=auth_headers).json()["id"]
+        client.post(f"/api/recipes/{recipe_id}/rate", json={"rating": 1 + n % 3}, headers=auth_headers)
+
+    ids, cursor = [], None
+    while True:
+        params = {"sort_by": "rating_desc", "limit": 2, "fields": "summary", **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/recipes", params=params)
+        assert response.status_code == 200
+        ids += [recipe["id"] for recipe in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(ids) == len(set(ids)) == int(response.headers["X-Total-Count"])
+
+
+@pytest.mark.parametrize("sort_by,values", [
+    ("rating_desc", ["rating_desc", None, {"a": 1}]),
+    ("rating_desc", ["rating_desc", "high", 3]),
+    ("rating_desc", ["rating_desc", 4.5, 2.5]),
+    ("rating_desc", ["rating_desc", True, 3]),
+    (None, [None, "3"]),
+    (None, [None, 2 ** 70]),
+    (None, [None]),
+    (None, ["rating_asc", 1.0, 3]),
+])
+def test_malformed_cursors_are_rejected(client, sort_by, values):
+    params = {"cursor": encode(values), **({"sort_by": sort_by} if sort_by else {})}
+    response = client.get("/api/recipes", params=params)
+    assert response.status_code == 400
+
+
+def test_undecodable_cursor_is_rejected(client):
+    assert client.get("/api/recipes", params={"cursor": "not a cursor!"}).status_code == 400
@@ -0,0 +1,65 @@
+# backend/tests/test_refreshing_index.py
+
+import threading
+import time
+
+from sqlmodel import Session
+
+from cache import RefreshingIndex
+from database import engine
+
+
+class CountingIndex(RefreshingIndex):
+    def __init__(self, max_age: float = 300):
+        super().__init__(max_age)
+        self.builds = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def _build(self, session):
+        self.release.wait(5)
+        with self._lock:
+            self.builds += 1
+            self._built_at = time.monotonic()
+
+
+def wait_for(condition, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_first_use_builds_inline_and_later_uses_serve_it():
+    index = CountingIndex()
+    with Session(engine) as session:
+        index._ensure_fresh(session)
+        assert index.builds == 1
+        index._ensure_fresh(session)
+    assert index.builds == 1
+
+
+def test_invalidated_index_keeps_serving_while_one_rebuild_runs():
+    index = CountingIndex()
+    with Session(engine) as session:
+        index._ensure_fresh(session)
+        index.release.clear()
+        index.invalidate()
+        # Returns straight away, however many requests arrive during the rebuild
+        for _ in range(3):
+            index._ensure_fresh(session)
+        assert index.builds == 1
+        index.release.set()
+    assert wait_for(lambda: index.builds == 2 and not index._refreshing)
+    assert not index._is_stale()
+
+
+def test_index_older_than_max_age_is_rebuilt():
+    index = CountingIndex(max_age=0)
+    with Session(engine) as session:
+        index._ensure_fresh(session)
+        time.sleep(0.01)
+        index._ensure_fresh(session)
+    assert wait_for(lambda: index.builds == 2)
@@ -0,0 +1,20 @@
+# backend/tests/test_seed.py
+
+from conftest import recipe_payload
+from response_cache import response_cache
+from seed import seed_database
+
+
+def test_reseed_clears_tags_so_tagged_recipes_can_be_saved_again(client, auth_headers):
+    created = client.post("/api/recipes", json=recipe_payload(tags=["Quick"]), headers=auth_headers)
+    assert created.status_code == 200
+
+    seed_database()
+    response_cache.bump("recipes") # the seed script normally runs in another process
+    assert client.get("/api/tags").json() == []
+
+    # Recipe ids start over after the reseed, so stale tag rows would collide with the new ones
+    saved = client.post("/api/recipes", json=recipe_payload(tags=["Quick"]), headers=auth_headers)
+    assert saved.status_code == 200
+    assert saved.json()["tags"] == ["Quick"]
+    assert client.get("/api/tags").json() == ["Quick"]
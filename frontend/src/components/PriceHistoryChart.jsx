@@ -5,19 +5,22 @@ import axios from 'axios';
 import { Line } from 'react-chartjs-2';
 import { Chart as ChartJS, CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend } from 'chart.js';
 import './PriceHistoryChart.css';
-import { getSimplePrice } from '../utils/priceUtils';
 
 ChartJS.register(CategoryScale, LinearScale, PointElement, LineElement, Title, Tooltip, Legend);
 
+const STORE_COLORS = ['#4caf50', '#e53935', '#1e88e5', '#fb8c00', '#8e24aa'];
+
 const PriceHistoryChart = ({ ingredient, onClose }) => {
-  const [history, setHistory] = useState([]);
+  // One series per store: { store, dates: [...], prices: [...cents] }, oldest first; long
+  // histories come back as weekly or monthly averages
+  const [series, setSeries] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     if (ingredient) {
-      axios.get(`http://127.0.0.1:8000/api/ingredient/${ingredient.ingredient_id}/price-history`)
+      axios.get('http://127.0.0.1:8000/api/price-history', { params: { ingredient_ids: ingredient.ingredient_id, resolution: 'auto' } })
         .then(response => {
-          setHistory(response.data.reverse()); // Reverse to show oldest first
+          setSeries(response.data);
           setLoading(false);
         })
         .catch(error => {
@@ -27,24 +30,28 @@ const PriceHistoryChart = ({ ingredient, onClose }) => {
     }
   }, [ingredient]);
 
+  // Stores record prices on different days, so each is plotted against every date (with gaps)
+  const dates = [...new Set(series.flatMap(s => s.dates))].sort();
   const chartData = {
-    labels: history.map(item => new Date(item.date_recorded).toLocaleDateString()),
-    datasets: [
-      {
-        label: `Price History for ${ingredient.ingredient_name}`,
-        data: history.map(item => getSimplePrice(item.price)),
-        borderColor: '#4caf50',
-        backgroundColor: 'rgba(76, 175, 80, 0.2)',
-        fill: true,
-      },
-    ],
+    labels: dates.map(d => new Date(d).toLocaleDateString()),
+    datasets: series.map((s, index) => {
+      const priceOn = Object.fromEntries(s.dates.map((d, i) => [d, s.prices[i] / 100]));
+      const color = STORE_COLORS[index % STORE_COLORS.length];
+      return {
+        label: s.store,
+        data: dates.map(d => priceOn[d] ?? null),
+        borderColor: color,
+        backgroundColor: color,
+        spanGaps: true,
+      };
+    }),
   };
 
   const chartOptions = {
     responsive: true,
     plugins: {
       legend: {
-        display: false,
+        display: series.length > 1,
       },
       title: {
         display: true,
@@ -71,7 +78,7 @@ const PriceHistoryChart = ({ ingredient, onClose }) => {
         <button className="close-button" onClick={onClose}>×</button>
         {loading ? (
           <p>Loading price history...</p>
-        ) : history.length > 0 ? (
+        ) : series.length > 0 ? (
           <Line options={chartOptions} data={chartData} />
         ) : (
           <p>No price history available for this item.</p>
@@ -14,6 +14,8 @@ const AllRecipesPage = ({ allSpecials }) => {
   const [minRating, setMinRating] = useState('');
   const [sortBy, setSortBy] = useState('');
   const [selectedTags, setSelectedTags] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // --- NEW: State to hold all possible tags from the API ---
   const [allAvailableTags, setAllAvailableTags] = useState([]);
@@ -26,20 +28,37 @@ const AllRecipesPage = ({ allSpecials }) => {
   }, []);
 
 
-  const fetchRecipes = () => {
-    setLoading(true);
+  const buildParams = () => {
     const params = {};
     if (minRating) params.min_rating = minRating;
     if (sortBy) params.sort_by = sortBy;
     if (selectedTags.length > 0) params.tags = selectedTags.join(',');
+    return params;
+  };
 
-
-    axios.get('http://127.0.0.1:8000/api/recipes', { params })
-      .then(res => setRecipes(res.data))
+  const fetchRecipes = () => {
+    setLoading(true);
+    axios.get('http://127.0.0.1:8000/api/recipes', { params: buildParams() })
+      .then(res => {
+        setRecipes(res.data);
+        setNextCursor(res.headers['x-next-cursor'] || null);
+      })
       .catch(err => console.error("Error fetching recipes!", err))
       .finally(() => setLoading(false));
   };
 
+  // --- Recipes come a page at a time; the cursor header points at the next page ---
+  const fetchMoreRecipes = () => {
+    setLoadingMore(true);
+    axios.get('http://127.0.0.1:8000/api/recipes', { params: { ...buildParams(), cursor: nextCursor } })
+      .then(res => {
+        setRecipes(prev => [...prev, ...res.data]);
+        setNextCursor(res.headers['x-next-cursor'] || null);
+      })
+      .catch(err => console.error("Error fetching more recipes!", err))
+      .finally(() => setLoadingMore(false));
+  };
+
   useEffect(() => { fetchRecipes(); }, [minRating, sortBy, selectedTags]);
 
   const handleDeleteRecipe = (recipeId) => {
@@ -95,6 +114,13 @@ const AllRecipesPage = ({ allSpecials }) => {
           selectedRecipes={selectedRecipes}
         />
       )}
+      {!loading && nextCursor && (
+        <div className="view-more-container">
+          <button className="view-more-btn" onClick={fetchMoreRecipes} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load More Recipes'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -31,6 +31,8 @@ const DashboardPage = ({ allSpecials }) => {
     if (minRating) params.min_rating = minRating;
     if (sortBy) params.sort_by = sortBy;
     if (selectedTags.length > 0) params.tags = selectedTags.join(',');
+    // Nine cards are shown; the tenth only tells us there are more to view
+    params.limit = 10;
 
     axios.get('http://127.0.0.1:8000/api/recipes', { params })
       .then(res => setRecipes(res.data))